@@ -0,0 +1,189 @@
+from collections import OrderedDict
+import queue
+import random
+import threading
+import time
+
+
+# Computer opponent. What it remembers lives in small tables that are updated on every flip,
+# so picking a tile never looks at the whole board.
+
+# capacity: tiles it can remember (None for all), slip: chance a flip is not remembered,
+# think_ms: pause before each flip so the human can follow
+DIFFICULTIES = {
+    'easy': {'capacity': 4, 'slip': 0.3, 'think_ms': 900},
+    'medium': {'capacity': 10, 'slip': 0.1, 'think_ms': 700},
+    'hard': {'capacity': None, 'slip': 0.0, 'think_ms': 450},
+}
+
+
+class ComputerPlayer:
+    def __init__(self, tiles, difficulty='medium', seed=None):
+        self.difficulty = difficulty
+        settings = DIFFICULTIES[difficulty]
+        self.capacity = settings['capacity']
+        self.slip = settings['slip']
+        self.think_ms = settings['think_ms']
+        self.rng = random.Random(seed)
+        self.new_game(tiles)
+
+    def new_game(self, tiles):
+        self.tiles = tiles
+        self.memory = OrderedDict()  # position -> card id, oldest first
+        self.seen = {}  # card id -> remembered positions
+        self.pairs = set()  # card ids with both positions remembered
+        # positions neither matched nor remembered, a list plus index for O(1) removal and random picks
+        self.unknown = list(range(tiles))
+        self.unknown_index = {i: i for i in range(tiles)}
+
+    # knowledge tables
+
+    def _add_unknown(self, i):
+        if i not in self.unknown_index:
+            self.unknown_index[i] = len(self.unknown)
+            self.unknown.append(i)
+
+    def _remove_unknown(self, i):
+        k = self.unknown_index.pop(i, None)
+        if k is not None:
+            last = self.unknown.pop()
+            if k < len(self.unknown):
+                self.unknown[k] = last
+                self.unknown_index[last] = k
+
+    def _forget(self, i):
+        card = self.memory.pop(i)
+        positions = self.seen[card]
+        positions.discard(i)
+        self.pairs.discard(card)
+        if not positions:
+            del self.seen[card]
+
+    def observe(self, i, card):
+        # any tile turned face up, by either player or the help button
+        if i in self.memory:
+            self.memory.move_to_end(i)
+            return
+        if self.rng.random() < self.slip:
+            return
+        self._remove_unknown(i)
+        self.memory[i] = card
+        positions = self.seen.setdefault(card, set())
+        positions.add(i)
+        if len(positions) >= 2:
+            self.pairs.add(card)
+        if self.capacity is not None and len(self.memory) > self.capacity:
+            oldest = next(iter(self.memory))
+            self._forget(oldest)
+            self._add_unknown(oldest)
+
+    def remove(self, i):
+        # a matched tile leaves the game
+        if i in self.memory:
+            self._forget(i)
+        self._remove_unknown(i)
+
+    # decisions
+
+    def _random_unknown(self, exclude=None):
+        candidates = len(self.unknown) - (exclude in self.unknown_index)
+        if candidates > 0:
+            while True:
+                i = self.unknown[self.rng.randrange(len(self.unknown))]
+                if i != exclude:
+                    return i
+        # everything left is remembered
+        return next(i for i in self.memory if i != exclude)
+
+    def choose(self, first=None):
+        # the first tile of a turn, or the second once first has been flipped and observed
+        if first is None:
+            if self.pairs:
+                return next(iter(self.seen[next(iter(self.pairs))]))
+            return self._random_unknown()
+        card = self.memory.get(first)
+        for i in self.seen.get(card, ()):
+            if i != first:
+                return i
+        return self._random_unknown(exclude=first)
+
+
+class ComputerWorker:
+    # owns a ComputerPlayer on its own thread; flips and move requests are queued in order so the
+    # tables are only ever touched by the worker, the game polls for the answer
+    def __init__(self, player):
+        self.player = player
+        self.requests = queue.Queue()
+        self.moves = queue.Queue()
+        self.decision_seconds = 0.0  # slowest decision so far
+        self._thread = threading.Thread(target=self._run, name="computer-player", daemon=True)
+        self._thread.start()
+
+    def new_game(self, tiles):
+        self.requests.put(('new_game', tiles))
+
+    def observe(self, i, card):
+        self.requests.put(('observe', i, card))
+
+    def remove(self, i):
+        self.requests.put(('remove', i))
+
+    def request_move(self, first=None):
+        self.requests.put(('move', first))
+
+    def get_move(self):
+        # non-blocking, None until the worker has decided
+        try:
+            return self.moves.get_nowait()
+        except queue.Empty:
+            return None
+
+    def stop(self, timeout=1.0):
+        self.requests.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            name, *args = request
+            if name == 'move':
+                start = time.perf_counter()
+                move = self.player.choose(*args)
+                self.decision_seconds = max(self.decision_seconds, time.perf_counter() - start)
+                self.moves.put(move)
+            else:
+                getattr(self.player, name)(*args)
+
+
+def benchmark(games=200, tiles=144, faces=8, seed=0):
+    # a hard computer plays itself on a large board, prints the worst decision time
+    from engine import MATCH, MISMATCH, MemoryEngine
+    engine = MemoryEngine(tiles, faces, seed=seed)
+    player = ComputerPlayer(tiles, 'hard', seed)
+    worst = 0.0
+    decisions = 0
+    for _ in range(games):
+        engine.new_game()
+        player.new_game(tiles)
+        while not engine.is_won():
+            pair = []
+            for _ in range(2):
+                start = time.perf_counter()
+                i = player.choose(pair[0] if pair else None)
+                worst = max(worst, time.perf_counter() - start)
+                decisions += 1
+                result = engine.select(i)
+                player.observe(i, engine.deck[i])
+                pair.append(i)
+            if result == MATCH:
+                player.remove(pair[0])
+                player.remove(pair[1])
+            elif result == MISMATCH:
+                engine.hide_mismatch()
+    print(f'{decisions} decisions on {tiles} tiles, worst {worst * 1e6:.0f} us')
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import pygame
+
+
+# Decoded assets kept on disk between launches: images as raw pixels in the display's byte order and
+# sounds as the mixer's PCM, each in a file of its own that is mapped and copied in one go instead of
+# being decoded again. Entries are named after a hash of the source's bytes and the target size, so an
+# edited source gets new entries and its old ones are deleted once no other source has those bytes.
+
+IMAGE_HEADER = struct.Struct('<4sHHB')  # magic, width, height, has alpha; BGRA pixels follow
+SOUND_HEADER = struct.Struct('<4sihi')  # magic, frequency, sample size, channels; PCM follows
+IMAGE_MAGIC = b'MGIM'
+SOUND_MAGIC = b'MGSN'
+INDEX = 'index.json'
+
+
+def file_digest(path):
+    with open(path, 'rb') as file:
+        return hashlib.blake2b(file.read(), digest_size=16).hexdigest()
+
+
+class AssetCache:
+    def __init__(self, directory='.asset_cache'):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        # path -> [mtime_ns, size, digest], so an unchanged file isn't hashed again
+        self.index = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(os.path.join(directory, INDEX)) as file:
+                self.index = json.load(file)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def digest(self, path):
+        # the hash of the file's bytes, entries made from an older version of it are deleted
+        stat = os.stat(path)
+        with self._lock:
+            known = self.index.get(path)
+        if known is not None and known[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return known[2]
+        digest = file_digest(path)
+        with self._lock:
+            self.index[path] = [stat.st_mtime_ns, stat.st_size, digest]
+            # another file with the same bytes still uses the old entries
+            if known is not None and known[2] != digest and all(entry[2] != known[2] for entry in self.index.values()):
+                self._remove_entries(known[2])
+            self._save_index()
+        return digest
+
+    def _remove_entries(self, digest):
+        for name in os.listdir(self.directory):
+            if name.startswith(digest):
+                os.remove(os.path.join(self.directory, name))
+
+    def _save_index(self):
+        path = os.path.join(self.directory, INDEX)
+        with open(path + '.tmp', 'w') as file:
+            json.dump(self.index, file)
+        os.replace(path + '.tmp', path)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write(self, name, header, data):
+        # written aside and renamed, a launch never maps a half written entry
+        path = self._path(name)
+        with open(path + '.tmp', 'wb') as file:
+            file.write(header)
+            file.write(data)
+        os.replace(path + '.tmp', path)
+        self.bytes_written += len(header) + len(data)
+
+    def _image_name(self, digest, size, alpha):
+        name = f'{digest}-{size[0]}x{size[1]}' if size else f'{digest}-full'
+        return name + ('-alpha.img' if alpha else '.img')
+
+    def has_image(self, digest, size, alpha):
+        return os.path.exists(self._path(self._image_name(digest, size, alpha)))
+
+    def image(self, digest, size, alpha, make):
+        # the display format surface for the source with this digest at size (None for the source's own),
+        # make() builds it when there is no entry; needs the display, so main thread only
+        name = self._image_name(digest, size, alpha)
+        surface = self._load_image(name)
+        if surface is not None:
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = make()
+        # 32 bit surfaces are stored in the display's byte order, converting them back is a plain copy
+        self._write(name, IMAGE_HEADER.pack(IMAGE_MAGIC, *surface.get_size(), alpha),
+                    pygame.image.tobytes(surface, 'BGRA'))
+        return surface
+
+    def _load_image(self, name):
+        try:
+            with open(self._path(name), 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, width, height, alpha = IMAGE_HEADER.unpack_from(data)
+                if magic != IMAGE_MAGIC or len(data) != IMAGE_HEADER.size + width * height * 4:
+                    return None
+                view = memoryview(data)[IMAGE_HEADER.size:]
+                mapped = pygame.image.frombuffer(view, (width, height), 'BGRA')
+                surface = mapped.convert_alpha() if alpha else mapped.convert()
+                # the mapping can only close once nothing points into it
+                del mapped
+                view.release()
+                self.bytes_read += len(data)
+                return surface
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def sound(self, path, make):
+        # the Sound for an audio file, stored as PCM in the mixer's current format
+        frequency, sample_size, channels = pygame.mixer.get_init()
+        name = f'{self.digest(path)}-{frequency}-{sample_size}-{channels}.pcm'
+        try:
+            with open(self._path(name), 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if SOUND_HEADER.unpack_from(data) == (SOUND_MAGIC, frequency, sample_size, channels):
+                    view = memoryview(data)[SOUND_HEADER.size:]
+                    sound = pygame.mixer.Sound(buffer=view)
+                    view.release()
+                    self.hits += 1
+                    self.bytes_read += len(data)
+                    return sound
+        except (OSError, ValueError, struct.error):
+            pass
+        self.misses += 1
+        sound = make()
+        self._write(name, SOUND_HEADER.pack(SOUND_MAGIC, frequency, sample_size, channels), sound.get_raw())
+        return sound
+
+    def files(self):
+        return [self._path(name) for name in os.listdir(self.directory) if name.endswith(('.img', '.pcm'))]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'bytes_read': self.bytes_read, 'bytes_written': self.bytes_written}
@@ -0,0 +1,71 @@
+from text_cache import LRUCache
+import sys
+import threading
+import time
+import pygame
+
+
+class AssetManager:
+    def __init__(self, max_variants=256):
+        self.images = {}  # path -> Surface as decoded from the file
+        self.sounds = {}  # path -> Sound
+        self.variants = LRUCache(max_variants)  # (path, size, alpha) -> converted, scaled Surface
+        self.load_stats = {}  # path -> (seconds spent loading, bytes in memory)
+        self.disk = None  # AssetCache, when set decoded images and sounds are kept on disk between launches
+        self._lock = threading.RLock()
+
+    def load_image(self, path):
+        # decoded once, safe to call from any thread
+        with self._lock:
+            if path not in self.images:
+                start = time.perf_counter()
+                image = pygame.image.load(path)
+                self.images[path] = image
+                self.load_stats[path] = (time.perf_counter() - start, image.get_bytesize() * image.get_width() * image.get_height())
+            return self.images[path]
+
+    def image(self, path, size=None, alpha=False):
+        # a display-format copy, optionally scaled; needs the display, so main thread only
+        key = (path, tuple(size) if size else None, alpha)
+        variant = self.variants.get(key)
+        if variant is None:
+            if self.disk is not None:
+                variant = self.disk.image(self.disk.digest(path), key[1], alpha, lambda: self.make_variant(path, size, alpha))
+            else:
+                variant = self.make_variant(path, size, alpha)
+            self.variants.put(key, variant)
+        return variant
+
+    def make_variant(self, path, size, alpha):
+        variant = self.load_image(path)
+        if size:
+            variant = pygame.transform.smoothscale(variant.convert_alpha(), size)
+        return variant.convert_alpha() if alpha else variant.convert()
+
+    def sound(self, path):
+        with self._lock:
+            if path not in self.sounds:
+                start = time.perf_counter()
+                if self.disk is not None:
+                    sound = self.disk.sound(path, lambda: pygame.mixer.Sound(path))
+                else:
+                    sound = pygame.mixer.Sound(path)
+                self.sounds[path] = sound
+                frequency, size, channels = pygame.mixer.get_init()
+                self.load_stats[path] = (time.perf_counter() - start, int(sound.get_length() * frequency * channels * abs(size) // 8))
+            return self.sounds[path]
+
+    def report(self):
+        # (path, seconds, bytes), slowest first
+        with self._lock:
+            rows = [(path, seconds, size) for path, (seconds, size) in self.load_stats.items()]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+    def print_report(self, file=sys.stderr, others=()):
+        # others are more (name, seconds, bytes) rows to list with these, e.g. the dealt card faces
+        for path, seconds, size in sorted(self.report() + list(others), key=lambda row: row[1], reverse=True):
+            print(f'asset: {path} {seconds * 1000:.1f} ms {size / 1024:.0f} KiB', file=file)
+
+
+# shared by every button, menu and the game
+assets = AssetManager()
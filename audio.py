@@ -0,0 +1,60 @@
+from assets import assets
+import pygame
+
+
+class AudioManager:
+    def __init__(self, num_channels=8):
+        self.num_channels = num_channels
+        self.effects = {}  # name -> preloaded Sound for short effects
+        self.music_path = None  # the track pygame.mixer.music is streaming, None when stopped
+        self.muted = False
+
+    def init(self):
+        # after pygame.mixer.init(): a fixed pool of channels shared by all effects
+        pygame.mixer.set_num_channels(self.num_channels)
+
+    def load_effect(self, name, path):
+        self.effects[name] = assets.sound(path)
+
+    def play(self, effect):
+        # effect is a name given to load_effect or a Sound
+        if self.muted:
+            return
+        sound = self.effects[effect] if isinstance(effect, str) else effect
+        # steal the oldest channel rather than drop the effect when the pool is full
+        channel = pygame.mixer.find_channel(True)
+        if channel is not None:
+            channel.play(sound)
+
+    def play_music(self, path, loops=-1):
+        # long tracks are streamed from disk, not decoded into memory; does nothing if already playing
+        if self.music_path == path:
+            return
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.play(loops)
+        self.music_path = path
+        if self.muted:
+            pygame.mixer.music.pause()
+
+    def stop_music(self):
+        if self.music_path is not None:
+            pygame.mixer.music.stop()
+            self.music_path = None
+
+    def set_muted(self, muted):
+        if muted == self.muted:
+            return
+        self.muted = muted
+        if muted:
+            pygame.mixer.pause()
+            pygame.mixer.music.pause()
+        else:
+            pygame.mixer.unpause()
+            pygame.mixer.music.unpause()
+
+    def toggle_mute(self):
+        self.set_muted(not self.muted)
+
+
+# shared by every button and the game
+audio = AudioManager()
@@ -0,0 +1,248 @@
+from text_cache import SurfaceCache, surface_bytes
+import argparse
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+import pygame
+
+
+# Themed card decks. A deck is a directory or a zip of images; indexing one only lists file names,
+# faces are decoded when they are dealt and drawn, and decoded surfaces live in a cache with a
+# memory budget, so memory doesn't grow with the size of the library.
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp')
+DEFAULT_DECK = 'default'
+DEFAULT_FACES = ['1.png', '2.png', '3.png', '4.png', '5.png', '6.png', '7.png', '8.png']
+
+
+def is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+class Deck:
+    def __init__(self, name, source, faces):
+        self.name = name
+        self.source = source  # directory, or path of a zip
+        self.faces = faces  # file names inside source
+        self._zip = None
+        self._lock = threading.Lock()  # ZipFile reads are not thread safe
+
+    def __len__(self):
+        return len(self.faces)
+
+    def deal(self, count, rng):
+        # face indices for a deal of count distinct cards; the whole deck, in order, when it has no more
+        if count >= len(self.faces):
+            return [k % len(self.faces) for k in range(count)]
+        return sorted(rng.sample(range(len(self.faces)), count))
+
+    def decode(self, face):
+        # safe from any thread, the surface is not converted to the display format
+        name = self.faces[face]
+        if os.path.isdir(self.source):
+            return pygame.image.load(os.path.join(self.source, name))
+        with self._lock:
+            if self._zip is None:
+                self._zip = zipfile.ZipFile(self.source)
+            data = self._zip.read(name)
+        return pygame.image.load(io.BytesIO(data), name)
+
+    def digest(self, face, cache):
+        # names the face's entries in an AssetCache: a hash of the file, or the zip's own CRC and size
+        name = self.faces[face]
+        if os.path.isdir(self.source):
+            return cache.digest(os.path.join(self.source, name))
+        with self._lock:
+            if self._zip is None:
+                self._zip = zipfile.ZipFile(self.source)
+            info = self._zip.getinfo(name)
+        return f'{info.CRC:08x}{info.file_size:08x}'
+
+    def close(self):
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+
+
+def open_deck(path):
+    # a directory or a zip of images, the deck is named after it
+    name = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+    if os.path.isdir(path):
+        faces = sorted(entry for entry in os.listdir(path) if is_image(entry))
+    else:
+        with zipfile.ZipFile(path) as archive:
+            faces = sorted(entry for entry in archive.namelist() if is_image(entry) and not entry.endswith('/'))
+    return Deck(name, path, faces)
+
+
+class DeckLibrary:
+    # every deck under root, plus the game's own eight faces
+    def __init__(self, root='decks'):
+        self.root = root
+        self.decks = {DEFAULT_DECK: Deck(DEFAULT_DECK, '.', DEFAULT_FACES)}
+        if os.path.isdir(root):
+            for entry in sorted(os.listdir(root)):
+                path = os.path.join(root, entry)
+                if os.path.isdir(path) or zipfile.is_zipfile(path):
+                    deck = open_deck(path)
+                    if len(deck) > 0:
+                        self.decks[deck.name] = deck
+
+    def names(self):
+        return list(self.decks)
+
+    def deck(self, name):
+        # by name, or a path outside the library
+        if name in self.decks:
+            return self.decks[name]
+        if os.path.exists(name):
+            deck = open_deck(name)
+            if len(deck) > 0:
+                self.decks[deck.name] = deck
+                return deck
+        raise ValueError(f'no card deck named {name}, have {", ".join(self.decks)}')
+
+
+class TextureCache(SurfaceCache):
+    # decoded and scaled faces under a memory budget
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk=None):
+        super().__init__(max_bytes)
+        self.disk = disk  # AssetCache, faces decoded and scaled by an earlier launch are read from it
+        self.load_stats = {}  # 'deck/face' -> (seconds spent decoding, bytes in memory)
+        self._lock = threading.RLock()  # the preload thread adds decoded faces
+        self._preload_thread = None
+
+    def get(self, key):
+        with self._lock:
+            return super().get(key)
+
+    def put(self, key, surface):
+        with self._lock:
+            super().put(key, surface)
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+
+    def texture(self, deck, face, size=None):
+        # display format, optionally scaled; needs the display, so main thread only
+        key = (deck.name, face, tuple(size) if size else None)
+        surface = self.get(key)
+        if surface is None:
+            if size:
+                def make():
+                    return pygame.transform.smoothscale(self.texture(deck, face), size)
+            else:
+                with self._lock:
+                    decoded = self._remove((deck.name, face, 'decoded'))
+
+                def make():
+                    return (decoded or self.decode(deck, face)).convert_alpha()
+            surface = self.disk.image(deck.digest(face, self.disk), key[2], True, make) if self.disk is not None else make()
+            self.put(key, surface)
+        return surface
+
+    def decode(self, deck, face):
+        start = time.perf_counter()
+        surface = deck.decode(face)
+        with self._lock:
+            self.load_stats[f'{deck.name}/{deck.faces[face]}'] = (time.perf_counter() - start, surface_bytes(surface))
+        return surface
+
+    def preload(self, deck, faces, done=None):
+        # decode the faces of a deal on a worker thread, they are converted when first drawn;
+        # done() is called on that thread once they all are
+        def load():
+            for face in faces:
+                with self._lock:
+                    cached = (deck.name, face, None) in self.entries or (deck.name, face, 'decoded') in self.entries
+                if self.disk is not None and self.disk.has_image(deck.digest(face, self.disk), None, True):
+                    cached = True  # read from disk when first drawn
+                if not cached:
+                    self.put((deck.name, face, 'decoded'), self.decode(deck, face))
+            if done is not None:
+                done()
+
+        self._preload_thread = threading.Thread(target=load, name="deck-preload", daemon=True)
+        self._preload_thread.start()
+
+    def wait(self, timeout=None):
+        if self._preload_thread is not None:
+            self._preload_thread.join(timeout)
+
+    def report(self):
+        # (face, seconds, bytes) for every face decoded so far, slowest first
+        with self._lock:
+            rows = [(name, seconds, size) for name, (seconds, size) in self.load_stats.items()]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+
+def make_deck(path, faces, size=(256, 256), seed=0):
+    # a zip of generated faces, for the benchmark
+    rng = random.Random(seed)
+    with zipfile.ZipFile(path, 'w') as archive:
+        for k in range(faces):
+            surface = pygame.Surface(size)
+            surface.fill((rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+            pygame.draw.circle(surface, (255, 255, 255), (size[0] // 2, size[1] // 2), size[0] // 3)
+            data = io.BytesIO()
+            pygame.image.save(surface, data, 'face.png')
+            archive.writestr(f'{k:04}.png', data.getvalue())
+
+
+def benchmark(faces=500, deals=200, pairs=72, max_bytes=32 * 1024 * 1024, seed=0):
+    # deals from a large generated deck and draws every dealt face at the tile and heatmap sizes;
+    # the cache's bytes stay under the budget however many distinct faces go through it
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'benchmark.zip')
+        make_deck(path, faces)
+        start = time.perf_counter()
+        deck = open_deck(path)
+        print(f'indexed {len(deck)} faces in {(time.perf_counter() - start) * 1000:.2f} ms')
+        textures = TextureCache(max_bytes)
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        for _ in range(deals):
+            dealt = deck.deal(pairs, rng)
+            for face in dealt:
+                textures.texture(deck, face)
+                textures.texture(deck, face, (28, 28))
+        seconds = time.perf_counter() - start
+        stats = textures.stats()
+        print(f'{deals} deals of {pairs} faces in {seconds:.2f}s, {seconds / deals * 1000:.1f} ms per deal')
+        print(f'cache: {stats["bytes"] / 2 ** 20:.1f} MiB held, peak {stats["peak_bytes"] / 2 ** 20:.1f} MiB '
+              f'of {max_bytes / 2 ** 20:.0f} MiB, {stats["evictions"]} evictions ({stats["evicted_bytes"] / 2 ** 20:.0f} MiB), '
+              f'hit rate {stats["hit_rate"]:.0%}')
+        deck.close()
+    finally:
+        shutil.rmtree(directory)
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List the card decks, or benchmark a large generated deck')
+    parser.add_argument('--root', default='decks')
+    parser.add_argument('--benchmark', action='store_true')
+    parser.add_argument('--faces', type=int, default=500)
+    parser.add_argument('--max-mib', type=int, default=32, help='texture cache budget')
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.faces, max_bytes=args.max_mib * 1024 * 1024)
+        return
+    library = DeckLibrary(args.root)
+    for name, deck in library.decks.items():
+        print(f'{name}: {len(deck)} faces from {deck.source}')
+
+
+if __name__ == "__main__":
+    main()
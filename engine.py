@@ -0,0 +1,164 @@
+import random
+import time
+
+
+# Game rules without pygame: a board is a list of card ids, tile state lives in integer bitmasks
+# (bit i is tile i) so every rule check is a couple of integer operations.
+
+SELECTED = 'selected'
+MATCH = 'match'
+MISMATCH = 'mismatch'
+
+
+class MemoryEngine:
+    def __init__(self, tiles=16, faces=8, players=1, seed=None):
+        if tiles % 2:
+            raise ValueError(f'a board needs an even number of tiles, got {tiles}')
+        self.tiles = tiles
+        self.faces = faces  # number of distinct card faces, pairs share faces when there are fewer faces than pairs
+        self.full_mask = (1 << tiles) - 1
+        self.rng = random.Random(seed)
+        self.time_attack = False
+        self.time_limit = 60  # seconds for the current Time Attack round
+        self.new_game(players)
+
+    def new_game(self, players=None):
+        if players is not None:
+            self.players = players
+        self.scores = [0] * self.players
+        self.current_player = 0
+        self.selected = []  # tiles picked this turn, at most two
+        self.selected_mask = 0
+        self.matched = 0
+        self.help_mask = 0  # pair shown by the help button
+        self.pending_hide = False  # a mismatched pair is showing
+        self.moves = 0
+        self.mismatches = 0
+        self.help_uses = 0
+        self.shuffle()
+
+    def shuffle(self):
+        self.deck = [k % self.faces for k in range(self.tiles // 2)] * 2
+        self.rng.shuffle(self.deck)
+        # card id -> positions, built once per deal
+        self.positions = {}
+        for i, card in enumerate(self.deck):
+            self.positions.setdefault(card, []).append(i)
+        # card id -> positions not matched yet, shrinks as pairs are found
+        self.unmatched = {card: set(positions) for card, positions in self.positions.items()}
+
+    # tile state
+
+    def is_matched(self, i):
+        return self.matched >> i & 1
+
+    def is_selected(self, i):
+        return self.selected_mask >> i & 1
+
+    def is_face_up(self, i):
+        return (self.matched | self.selected_mask | self.help_mask) >> i & 1
+
+    def can_select(self, i):
+        return (not self.pending_hide and len(self.selected) < 2 and 0 <= i < self.tiles
+                and not (self.matched | self.selected_mask) >> i & 1)
+
+    def is_won(self):
+        return self.matched == self.full_mask
+
+    # moves
+
+    def select(self, i):
+        # returns None when the tile can't be picked, otherwise SELECTED, MATCH or MISMATCH
+        if not self.can_select(i):
+            return None
+        self.selected.append(i)
+        self.selected_mask |= 1 << i
+        if len(self.selected) < 2:
+            return SELECTED
+        self.moves += 1
+        first, second = self.selected
+        card = self.deck[first]
+        if card == self.deck[second]:
+            self.matched |= self.selected_mask
+            remaining = self.unmatched[card]
+            remaining.discard(first)
+            remaining.discard(second)
+            if not remaining:
+                del self.unmatched[card]
+            self.scores[self.current_player] += 1
+            self.selected = []
+            self.selected_mask = 0
+            return MATCH
+        self.mismatches += 1
+        self.pending_hide = True
+        self.current_player = (self.current_player + 1) % self.players
+        return MISMATCH
+
+    def hide_mismatch(self):
+        # returns False when no mismatched pair is showing, so a late timer can't clear a new first pick
+        if not self.pending_hide:
+            return False
+        self.selected = []
+        self.selected_mask = 0
+        self.pending_hide = False
+        return True
+
+    def help_pair(self):
+        # shows a pair that is neither matched nor face up, returns it or None; a card is only skipped
+        # when a selected tile holds one of its last two, so this looks at len(self.selected) + 1 cards at most
+        for card, positions in self.unmatched.items():
+            free = [i for i in positions if not self.selected_mask >> i & 1][:2]
+            if len(free) == 2:
+                self.help_mask = 1 << free[0] | 1 << free[1]
+                self.help_uses += 1
+                return free[0], free[1]
+        return None
+
+    def remaining_pairs(self):
+        # card id -> pairs still on the board, for the hint heatmap
+        return {card: len(positions) // 2 for card, positions in self.unmatched.items()}
+
+    def hide_help(self):
+        self.help_mask = 0
+
+    # Time Attack
+
+    def start_time_attack(self, time_limit=60):
+        self.time_attack = True
+        self.time_limit = time_limit
+
+    def next_round(self, step=5, minimum=10):
+        # each won round takes step seconds off the clock, but no less than minimum
+        self.time_limit = max(minimum, self.time_limit - step)
+        self.new_game()
+
+
+def benchmark(games=20000, tiles=16, seed=0):
+    # random players on a headless board, prints simulated moves per second
+    engine = MemoryEngine(tiles, seed=seed)
+    random_value = random.Random(seed).random
+    moves = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        engine.new_game()
+        hidden = list(range(tiles))
+        while hidden:
+            n = len(hidden)
+            a = int(random_value() * n)
+            b = int(random_value() * (n - 1))
+            b += b >= a
+            engine.select(hidden[a])
+            result = engine.select(hidden[b])
+            if result == MISMATCH:
+                engine.hide_mismatch()
+            else:
+                for k in sorted((a, b), reverse=True):
+                    hidden[k] = hidden[-1]
+                    hidden.pop()
+            moves += 1
+    seconds = time.perf_counter() - start
+    print(f'{games} games, {moves} moves in {seconds:.2f}s: {moves / seconds:,.0f} moves/s')
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,59 @@
+from text_cache import SurfaceCache
+import math
+import pygame
+
+
+class FlipAnimation:
+    def __init__(self, size, frames=16, max_bytes=32 * 1024 * 1024, max_frame=256):
+        self.width, self.height = size
+        self.frames = frames  # the first half shows the back shrinking, the second the face growing
+        self.half = frames // 2
+        # frames are baked at most max_frame pixels on their longer side and scaled up while drawn on
+        # larger tiles, a flip only lasts a moment and the resting face is drawn at full size
+        scale = min(1.0, max_frame / max(size))
+        self.frame_width = max(1, round(self.width * scale))
+        self.frame_height = max(1, round(self.height * scale))
+        self.sheets = SurfaceCache(max_bytes)  # key -> baked sprite sheet
+
+    def bake(self, surface, shrinking):
+        # one row of half frames, each a horizontally squashed copy centred in its cell
+        image = pygame.transform.smoothscale(surface, (self.frame_width, self.frame_height))
+        sheet = pygame.Surface((self.frame_width * self.half, self.frame_height), pygame.SRCALPHA).convert_alpha()
+        for k in range(self.half):
+            if shrinking:
+                scale = math.cos(math.pi / 2 * k / self.half)
+            else:
+                scale = math.sin(math.pi / 2 * (k + 1) / self.half)
+            width = max(1, int(round(self.frame_width * scale)))
+            frame = pygame.transform.smoothscale(image, (width, self.frame_height))
+            sheet.blit(frame, (k * self.frame_width + (self.frame_width - width) // 2, 0))
+        return sheet
+
+    def sheet(self, key, surface, shrinking):
+        # baked lazily, the first time a card (or tile back) flips
+        key = (key, shrinking)
+        sheet = self.sheets.get(key)
+        if sheet is None:
+            sheet = self.bake(surface, shrinking)
+            self.sheets.put(key, sheet)
+        return sheet
+
+    def frame(self, progress):
+        # progress runs from 0 (face down) to 1 (face up)
+        return min(self.frames - 1, max(0, int(progress * self.frames)))
+
+    def draw(self, screen, position, progress, back_key, back, face_key, face):
+        k = self.frame(progress)
+        if k < self.half:
+            sheet = self.sheet(back_key, back, True)
+        else:
+            sheet = self.sheet(face_key, face, False)
+            k -= self.half
+        area = pygame.Rect(k * self.frame_width, 0, self.frame_width, self.frame_height)
+        if (self.frame_width, self.frame_height) == (self.width, self.height):
+            screen.blit(sheet, position, area)
+        else:
+            screen.blit(pygame.transform.scale(sheet.subsurface(area), (self.width, self.height)), position)
+
+    def clear(self):
+        self.sheets.clear()
@@ -1,12 +1,40 @@
-from vosk import Model, KaldiRecognizer
+import time
+process_start = time.perf_counter()  # startup is measured from here
+
+from ai import DIFFICULTIES, ComputerPlayer, ComputerWorker
+from asset_cache import AssetCache
+from assets import assets
+from engine import MATCH, MISMATCH, MemoryEngine
+from audio import audio
+from decks import DEFAULT_DECK, DeckLibrary, TextureCache
+from flip_animation import FlipAnimation
+from netplay import (DEAL, DISCONNECTED, FLIP, HELP_PAIR, HELP_REQUEST, HIDE, HIDE_HELP, MATCHED, REMOTE_PLAYER, SELECT, TIMER, TURN,
+                     MirrorEngine, NetClient, NetServer, select_messages)
+from profiler import profiler
+from replay import Recorder
+from stats_store import TIME_ATTACK, StatsStore
+from text_cache import text_cache
+from voice_control import EnergyVad, ModelLoader, VoiceWorker
+import argparse
 import os
+import random
 import sys
-import json
-import pyaudio
 import pygame
 import pygame.transform
-import random
-import time
+
+
+# timer events, scheduled with pygame.time.set_timer instead of polling the clock every frame
+HIDE_MISMATCH_EVENT = pygame.USEREVENT + 1
+HIDE_HELP_EVENT = pygame.USEREVENT + 2
+TIMER_TICK_EVENT = pygame.USEREVENT + 3
+VOICE_COMMAND_EVENT = pygame.USEREVENT + 4  # posted by the voice worker to wake the loop
+COMPUTER_MOVE_EVENT = pygame.USEREVENT + 5  # the computer's think delay is over
+NET_EVENT = pygame.USEREVENT + 6  # posted by the network thread to wake the loop
+SCORES_EVENT = pygame.USEREVENT + 7  # the stats writer has read the Scores screen's lines
+
+# the menu title pulses through at most this many font sizes, well within the text cache's fonts
+# however large the window scales the pulse range
+PULSE_STEPS = 40
 
 
     
@@ -16,10 +44,18 @@ class Button:
         self.text = text
         self.color = color  # Default color: white
         self.text_color = (0, 0, 0)   # Text color: black
-        self.font = pygame.font.Font(None, 32)  # Default font
+        self.font_face = None  # Default font
+        self.font_size = 32
+        self.font = text_cache.font(self.font_face, self.font_size)
         self.disabled = disabled # check if the button clickable'
-        self.click_sound = pygame.mixer.Sound(click_sound)
-        self.image = pygame.image.load(image) if image else None
+        self.click_sound = assets.sound(click_sound)  # decoded once for all buttons
+        self.image = image  # path, drawn through the asset manager at the button's size
+
+    def place(self, x, y, width, height, scale=1.0):
+        # moved and resized by the game's layout, the text scales with it
+        self.rect = pygame.Rect(x, y, width, height)
+        self.font_size = max(8, round(32 * scale))
+        self.font = text_cache.font(self.font_face, self.font_size)
 
     def get_text(self):
         return self.text
@@ -38,11 +74,10 @@ class Button:
         # Draw the button
         pygame.draw.rect(screen, self.color, self.rect, 0, 10)
         if self.image:
-            # Resize image to fit the button
-            image_surface = pygame.transform.scale(self.image, (self.rect.width, self.rect.height))
-            screen.blit(image_surface, self.rect)
+            # Resize image to fit the button, scaled once and cached
+            screen.blit(assets.image(self.image, self.rect.size, alpha=True), self.rect)
         elif self.text:
-            text_surface = self.font.render(self.text, True, self.text_color)
+            text_surface = text_cache.render(self.font_face, self.font_size, self.text, self.text_color)
             # Center the text on the button
             text_rect = text_surface.get_rect(center=self.rect.center)
             screen.blit(text_surface, text_rect)
@@ -53,7 +88,7 @@ class Button:
         else:
             check_click = self.rect.collidepoint(event_pos)
             if check_click:
-                self.click_sound.play()
+                audio.play(self.click_sound)
             return check_click
 
 class Menu:
@@ -76,14 +111,35 @@ class Menu:
         # Moving text attributes
         self.moving_text_color = (255, 255, 0)  # Yellow color
         self.moving_text_position = [0, menu_height // 2]  # Starting position of the text
-        self.moving_text_speed = 0.5  # Pixels per frame
-        self.font = pygame.font.Font(None, 32)  # You can use the same font as buttons or a different one
+        self.previous_moving_text_x = 0
+        self.moving_text_width = 0
+        self.moving_text_speed = 60  # Pixels per second
+        self.font = text_cache.font(None, 32)  # You can use the same font as buttons or a different one
 
         self.pulsing_text_color = (255, 255, 0)  # Yellow color
         self.pulsing_text_size = 32
         self.pulsing_text_min_size = 24
         self.pulsing_text_max_size = 100
-        self.pulsing_text_size_change = 0.07
+        self.pulsing_text_size_change = 40  # Font size change per second
+        self.previous_pulsing_text_size = self.pulsing_text_size
+        self.title_y = 80
+        self.scale = 1.0
+
+    def resize(self, menu_width, menu_height, scale=1.0):
+        # follows the window, the title's range of sizes scales with it
+        ratio = scale / self.scale
+        self.scale = scale
+        self.menu_width = menu_width
+        self.menu_height = menu_height
+        self.surface = pygame.Surface((menu_width, menu_height), pygame.SRCALPHA)
+        self.surface.fill((128, 128, 128, self.background_alpha))
+        self.moving_text_position[1] = menu_height // 2
+        self.title_y = round(80 * scale)
+        self.pulsing_text_min_size = 24 * scale
+        self.pulsing_text_max_size = 100 * scale
+        self.pulsing_text_size_change *= ratio
+        self.pulsing_text_size *= ratio
+        self.previous_pulsing_text_size *= ratio
 
     def add_button(self, text = None, button = None):
         # Calculate the position of the new button
@@ -104,43 +160,107 @@ class Menu:
             if button.get_text() == text:
                 return button.is_clicked(event_pos)
 
-    def update_and_draw_pulsing_text(self, screen):
-        # Update font size
-        self.pulsing_text_size += self.pulsing_text_size_change
+    def update(self, dt):
+        # advance the animations by dt seconds, the previous state is kept for interpolation
+        self.previous_pulsing_text_size = self.pulsing_text_size
+        self.pulsing_text_size += self.pulsing_text_size_change * dt
         if self.pulsing_text_size > self.pulsing_text_max_size or self.pulsing_text_size < self.pulsing_text_min_size:
+            self.pulsing_text_size = max(self.pulsing_text_min_size, min(self.pulsing_text_max_size, self.pulsing_text_size))
             self.pulsing_text_size_change *= -1  # Reverse the direction of size change
 
-        # Create text surface with updated size
-        font = pygame.font.Font(None, int(self.pulsing_text_size))
-        text_surface = font.render(self.moving_text, True, self.pulsing_text_color)
-        text_rect = text_surface.get_rect(center=(self.menu_width // 2, 80))
+        self.previous_moving_text_x = self.moving_text_position[0]
+        self.moving_text_position[0] += self.moving_text_speed * dt
+        if self.moving_text_position[0] > self.menu_width:
+            self.moving_text_position[0] = -self.moving_text_width  # Reset position to start from the left again
+            self.previous_moving_text_x = self.moving_text_position[0]
+
+    def pulsing_text_font_size(self, alpha=1.0):
+        size = self.previous_pulsing_text_size + (self.pulsing_text_size - self.previous_pulsing_text_size) * alpha
+        step = max(1.0, (self.pulsing_text_max_size - self.pulsing_text_min_size) / (PULSE_STEPS - 1))
+        return int(self.pulsing_text_min_size + round((size - self.pulsing_text_min_size) / step) * step)
+
+    def pulsing_text_rect(self, alpha=1.0):
+        font = text_cache.font(None, self.pulsing_text_font_size(alpha))
+        text_rect = pygame.Rect((0, 0), font.size(self.moving_text))
+        text_rect.center = (self.menu_width // 2, self.title_y)
+        return text_rect
+
+    def draw_pulsing_text(self, screen, alpha=1.0):
+        text_surface = text_cache.render(None, self.pulsing_text_font_size(alpha), self.moving_text, self.pulsing_text_color)
+        text_rect = text_surface.get_rect(center=(self.menu_width // 2, self.title_y))
 
         # Draw the text
         screen.blit(text_surface, text_rect)
 
-    def update_and_draw_moving_text(self, screen):
-        text_surface = self.font.render(self.moving_text, True, self.moving_text_color)
-        text_rect = text_surface.get_rect(center=self.moving_text_position)
+    def draw_moving_text(self, screen, alpha=1.0):
+        text_surface = text_cache.render(None, round(32 * self.scale), self.moving_text, self.moving_text_color)
+        self.moving_text_width = text_surface.get_width()
+        x = self.previous_moving_text_x + (self.moving_text_position[0] - self.previous_moving_text_x) * alpha
+        text_rect = text_surface.get_rect(center=(x, self.moving_text_position[1]))
 
         # Draw the text on the screen
         screen.blit(text_surface, text_rect)
 
-        # Update the position for the next frame
-        self.moving_text_position[0] += self.moving_text_speed
-        if self.moving_text_position[0] > screen.get_width():
-            self.moving_text_position[0] = -text_rect.width  # Reset position to start from the left again
-
 
-    def draw(self, screen, is_transparent):
+    def draw(self, screen, is_transparent, alpha=1.0):
         if is_transparent:
             # Blit the semi-transparent menu surface to the screen
             screen.blit(self.surface, (0, 0))
         else:
             pygame.draw.rect(screen, (72.9, 72.2, 42.4), [0, 0, self.menu_width, self.menu_height])
-        self.update_and_draw_pulsing_text(screen)
+        self.draw_pulsing_text(screen, alpha)
         for button in self.buttons:
             button.draw(screen)
 
+class Compositor:
+    def __init__(self, screen):
+        self.screen = screen
+        self.full_redraw = False  # for debugging: redraw and flip the whole screen every frame
+        self.dirty = []
+        self.all_dirty = True
+        self.regions = {}  # name -> (state key, rect) as of the last frame
+
+    def mark_all(self):
+        self.all_dirty = True
+
+    def mark(self, rect):
+        if rect.width > 0 and rect.height > 0:
+            self.dirty.append(pygame.Rect(rect))
+
+    def track(self, name, rect, key):
+        # a region is redrawn when its state key or its position changed since the last frame
+        previous = self.regions.get(name)
+        if previous is not None and previous[0] == key and previous[1] == rect:
+            return False
+        self.mark(rect)
+        if previous is not None:
+            self.mark(previous[1])
+        self.regions[name] = (key, pygame.Rect(rect))
+        return True
+
+    def forget(self, name):
+        previous = self.regions.pop(name, None)
+        if previous is not None:
+            self.mark(previous[1])
+
+    def present(self, draw):
+        if self.full_redraw or self.all_dirty:
+            draw()
+            profiler.start('display')
+            pygame.display.flip()
+            profiler.stop('display')
+        elif self.dirty:
+            # draw the scene once, clipped to the dirty area, and push only the dirty rects
+            self.screen.set_clip(self.dirty[0].unionall(self.dirty[1:]))
+            draw()
+            self.screen.set_clip(None)
+            profiler.start('display')
+            pygame.display.update(self.dirty)
+            profiler.stop('display')
+        self.dirty = []
+        self.all_dirty = False
+
+
 class Player:
     def __init__(self, player_number, score=0, color = (0,0,0)):
         self.player_number = player_number
@@ -156,69 +276,111 @@ class Player:
         self.score = 0
 
 class MemoryGame:
-    def __init__(self, game_mode = 1):
+    def __init__(self, game_mode = 1, grid_size = (4, 4), seed=None, deck=None):
+        self.startup_marks = {}  # seconds since process start, see mark_startup
+        # every deal and the computer player draw their seeds from here, so a session replays from one number
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.rng = random.Random(self.seed)
+        # MEMORYGAME_RECORD=path logs the session for replay.py, replaying is set while one is played back
+        self.recorder = Recorder(os.environ['MEMORYGAME_RECORD'], self.seed, grid_size) if os.environ.get('MEMORYGAME_RECORD') else None
+        self.replaying = False
+        self.mark_startup('imports')
         pygame.init()
         pygame.mixer.init()
+        audio.init()
+        # decoded sounds, scaled images and card faces are kept on disk so the next launch maps them
+        # instead of decoding again; MEMORYGAME_ASSET_CACHE= (empty) turns this off
+        cache_directory = os.environ.get('MEMORYGAME_ASSET_CACHE', '.asset_cache')
+        if cache_directory and assets.disk is None:
+            assets.disk = AssetCache(cache_directory)
 
-        # Screen dimensions
+        # Screen dimensions; the window can be resized and F11 toggles fullscreen, see layout()
         self.screen_width = 700
         self.screen_height = 500
-        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
+        self.base_size = (700, 500)  # the size every position below is given for
+        self.min_size = (420, 300)
+        self.ui_scale = 1.0
+        self.fullscreen = False
+        self.window_size = (self.screen_width, self.screen_height)  # restored when leaving fullscreen
+        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height), pygame.RESIZABLE)
         self.background_color = (255, 255, 255)
+        # only regions that changed are redrawn and pushed to the display
+        self.compositor = Compositor(self.screen)
+        self.background_surface = None
+        self.tile_backs = {}  # (tile index, colour) -> face-down tile surface
+        # baked flips for the current tile size only, a resize drops the old sheets
+        self.flip_animation = None
+        self.flip_animation_key = None
         
         # Colors and sounds
         self.colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255)] * 2
-        self.match_sound = pygame.mixer.Sound('Win.wav')
-        self.Lose_sound = pygame.mixer.Sound('Lose.wav')
-        self.flip_sound = pygame.mixer.Sound('flip_sound.wav')
-        self.start_sound = pygame.mixer.Sound('IDF.mp3')
+        # short effects are preloaded, the menu music is streamed
+        audio.load_effect('match', 'Win.wav')
+        audio.load_effect('lose', 'Lose.wav')
+        audio.load_effect('flip', 'flip_sound.wav')
+        self.menu_music = 'IDF.mp3'
         self.gray = (128, 128, 128)
 
-        # Load the Vosk model
+        # The Vosk model is loaded in the background once the main menu is on screen
         self.model_path = "vosk-model-small-en-us-0.15"
-        if not os.path.exists(self.model_path):
-            exit(1)
-        self.model = Model(self.model_path)
-        self.stream_start = False
-        self.number_words = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
-                        'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
-                        'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14,
-                        'fifteen': 15, 'sixteen': 16, 'seventeen': 17, 'eighteen': 18,
-                        'nineteen': 19, 'twenty': 20}
+        self.model_loader = ModelLoader(self.model_path)
+        # restrict recognition to the board's tile numbers and act on partial results
+        self.voice_use_grammar = True
+        # silence between turns is dropped before it reaches the recognizer
+        self.voice_vad_thresholds = {'energy_threshold': 500, 'zcr_threshold': 0.25, 'preroll': 2, 'hangover': 3}
 
         # Game variables
-        self.grid_size = (4, 4)
-        self.rect_width = 600 // self.grid_size[0]
-        self.rect_height = 400 // self.grid_size[1]
-        self.rects = [pygame.Rect(x * self.rect_width + 60, y * self.rect_height + 60, self.rect_width - 20, self.rect_height - 20)
-                      for x in range(self.grid_size[0]) for y in range(self.grid_size[1])]
-        self.is_fliping = [False] * self.grid_size[0] * self.grid_size[1]
+        # board area the grid is laid out in, grid_size is (columns, rows)
+        self.board_area = pygame.Rect(60, 60, 600, 400)
+        self.board_sizes = [(4, 4), (6, 6), (8, 8), (12, 12)]
         # random.shuffle(self.colors)
-        self.revealed = [False] * len(self.rects)
-        self.selected = []
-        self.selected_for_help = []
-        self.matched = []
         self.game_end = False
-        self.waiting_to_hide = False
-        self.waiting_to_hide_help = False
-        self.last_check_time = 0
+        self.hide_delay = 500  # ms a mismatched pair stays visible
+        self.help_hide_delay = 900  # ms the help pair stays visible
         #self.restart_button = pygame.Rect(10, self.screen_height - 40, 100, 20)
         # mode menu endle
         self.main_menu = Menu("IDF memory game", self.screen_width, self.screen_height, self.screen_width/20, self.screen_height/3,200, 50)
         self.main_menu.add_button("Time Attack")
         self.main_menu.add_button("1 Player")
         self.main_menu.add_button("2 Players")
-        self.voice_button = Button(self.screen_width/20 + 210, self.screen_height/3 +60, 200, 50, 'Voice Control')
+        self.voice_button = Button(self.screen_width/20 + 210, self.screen_height/3 +60, 200, 50, 'Loading voice...')
+        self.voice_button.button_disable()
         self.main_menu.add_button(None, self.voice_button)
+        self.board_button = Button(self.screen_width/20, self.screen_height/3 +60, 200, 50, '')
+        self.main_menu.add_button(None, self.board_button)
+        # third row: play against the computer, the level button cycles its difficulty
+        self.computer_button = Button(self.screen_width/20, self.screen_height/3 +120, 200, 50, 'vs Computer')
+        self.main_menu.add_button(None, self.computer_button)
+        self.computer_difficulty = 'medium'
+        self.difficulty_button = Button(self.screen_width/20 + 210, self.screen_height/3 +120, 200, 50, 'Level: medium')
+        self.main_menu.add_button(None, self.difficulty_button)
+        self.scores_button = Button(self.screen_width/20 + 420, self.screen_height/3 +120, 200, 50, 'Scores')
+        self.main_menu.add_button(None, self.scores_button)
         self.in_main_menu = True
 
 
+        # flip animation length in seconds, voice control flips faster
+        self.flip_duration = 0.3
+        self.voice_flip_duration = 0.05
+
+        # loop timing: rendering is capped at target_fps (0 = uncapped), game state advances in fixed steps
+        self.target_fps = 60
+        self.update_rate = 120
+        self.max_frame_time = 0.25  # seconds, longer stalls are not caught up
+        # block in pygame.event.wait while nothing animates instead of spinning at target_fps
+        self.event_driven = True
+        self.idle_timeout = 1000  # ms, upper bound on one idle wait
+        # F3 shows frame timings, F4 writes them as a Chrome trace; MEMORYGAME_PROFILE records from the start
+        self.show_profiler_hud = False
+        self.profile = bool(os.environ.get('MEMORYGAME_PROFILE'))
+        self.trace_path = 'frame_trace.json'
+        profiler.set_enabled(self.profile)
+
         # flip array to store the stage in the flip for every tile when 0 is face down and 10 is face up
-        self.flip_arry = [0]*(self.grid_size[0]*self.grid_size[1])
+        self.flip_arry = [0]*(grid_size[0]*grid_size[1])
 
         # attack mode
         self.time_attack_mode = False
-        self.time_limit = 60  # Starting time limit for Time Attack mode
 
         self.rest_button = Button(10, self.screen_height - 40, 100, 30, 'reset')
         self.help_button = Button(200, 20, 300, 30, 'help', False, "Lose.wav",'helper.png')
@@ -227,101 +389,329 @@ class MemoryGame:
         self.win_menu =Menu("Well done!", self.screen_width, self.screen_height, self.screen_width/2, self.screen_height/2,200, 100)
         self.win_menu.add_button(None, self.play_again_button)
         self.help = False
-        self.is_mute = False
-        self.sound_paused = False
+        # H toggles a strip showing how many pairs of each card are left
+        self.show_heatmap = False
+        self.heatmap_rect = pygame.Rect(120, self.screen_height - 42, self.screen_width - 170, 34)
         self.help_timer = 0
 
         # players endle
         self.game_mode = game_mode
         self.voice_control_mode = False
-        self.current_player = Player(0)
-        self.players  = [self.current_player]
+        self.players  = [Player(0)]
+        # the computer is player 2 when playing against it
+        self.computer = None  # ComputerWorker while such a game runs
+        self.computer_seed = None  # set to replay the computer's choices
+        self.computer_waiting = False  # a think delay is running
+        # a game over the network, see host() and join(): the host is player 1 and owns the board
+        self.net = None  # NetServer when hosting, NetClient when joined
+        self.net_game = False  # the host's current "2 Players" game has a remote player 2
+        self.net_message = None  # shown where the net stats were once a joined host has gone
+        self.remote_help_used = False
+        self.net_stats_position = (5, 42)  # round trip time and traffic, under the timer
+        self.net_font_size = 18
+        # finished games go to a local database, the Scores screen reads it
+        self.stats = StatsStore(os.environ.get('MEMORYGAME_STATS', 'memorygame_stats.db'))
+        self.player_name = os.environ.get('MEMORYGAME_PLAYER') or os.environ.get('USER') or 'player'
+        self.game_run = None  # totals of the game in progress, a Time Attack run spans several deals
+        self.show_scores = False
+        self.scores_lines = ()  # (text, colour), read on the stats writer thread when the screen is opened
         
 
          # Load images
-        #image_paths = ['1.png', '2.png']
-        self.image_paths = ['1.png', '2.png', '3.png', '4.png', '5.png', '6.png', '7.png', '8.png']
-        self.images = [pygame.transform.scale(pygame.image.load(path), (10, self.rect_height - 20)) for path in self.image_paths] * 2
-        self.images1 = [pygame.transform.scale(pygame.image.load(path), (self.rect_width - 80, self.rect_height - 20)) for path in self.image_paths] * 2
-        self.images2 = [pygame.transform.scale(pygame.image.load(path), (self.rect_width - 40, self.rect_height - 20)) for path in self.image_paths] * 2
-        self.images3 = [pygame.transform.scale(pygame.image.load(path), (self.rect_width - 20, self.rect_height - 20)) for path in self.image_paths] * 2
-        self.image_stage =[0]*16
-        
-        # Zip the lists to combine corresponding elements from each list into tuples
-        self.combined_images = list(zip(self.images, self.images1, self.images2, self.images3, self.image_stage))
-
-        # Since zip creates tuples, convert each tuple to a list
-        self.combined_images = [list(group) for group in self.combined_images]
-        random.shuffle(self.combined_images)
-        random.shuffle(self.images)
-        
+        # card faces come from a deck, a directory or zip under decks/ picked with MEMORYGAME_DECK;
+        # each deal uses a subset of its faces and only those are decoded, in the background
+        self.deck_library = DeckLibrary()
+        self.deck = self.deck_library.deck(deck or os.environ.get('MEMORYGAME_DECK') or DEFAULT_DECK)
+        self.textures = TextureCache(disk=assets.disk)  # decoded and scaled faces under a memory budget
+        self.card_faces = []  # card id -> face index in the deck, set for every deal
 
         # Timer
         self.start_ticks = pygame.time.get_ticks()
         self.elapsed_ticks = pygame.time.get_ticks() - self.start_ticks
-        self.font = pygame.font.Font("digital-7.ttf", 36)
+        self.font_face = "digital-7.ttf"
+        self.font_size = 36
+        self.font = text_cache.font(self.font_face, self.font_size)
+        self.timer_position = (5, 5)
+
+        self.voice_worker = None
+        self.layout(self.screen.get_size())
+        self.set_grid(grid_size)
+        self.mark_startup('init')
 
     def draw_backgrounds(self, transparent = None):
         if transparent:
             pygame.draw.rect(transparent, self.gray, [0, 0, self.screen_width, self.screen_height])
         else:
-            pygame.draw.rect(self.screen, (72.9, 72.2, 42.4), [0, 0, self.screen_width, self.screen_height])
+            if self.background_surface is None:
+                self.background_surface = pygame.Surface((self.screen_width, self.screen_height)).convert()
+                self.background_surface.fill(self.background_color)
+                pygame.draw.rect(self.background_surface, (72.9, 72.2, 42.4), [0, 0, self.screen_width, self.screen_height])
+            self.screen.blit(self.background_surface, (0, 0))
         # pygame.draw.rect(self.screen, self.gray, [0, 0, self.screen_width, 50])
         # pygame.draw.rect(self.screen, self.gray, [0, 50, self.screen_width, self.screen_height - 100])
         # pygame.draw.rect(self.screen, self.gray, [0, self.screen_height - 50, self.screen_width, 50])
 
 
+    def tile_back(self, i):
+        key = (i, self.current_player.color)
+        if key not in self.tile_backs:
+            rect = self.rects[i]
+            surface = pygame.Surface(rect.size, pygame.SRCALPHA).convert_alpha()
+            # Draw a black rectangle (or some background) for hidden tiles
+            pygame.draw.rect(surface, self.current_player.color, surface.get_rect(), 0, 10)
+            text_surface = text_cache.render(self.font_face, self.tile_font_size, str(i+1), (255, 255, 255))
+            # Center the text on the button
+            surface.blit(text_surface, text_surface.get_rect(center=surface.get_rect().center))
+            self.tile_backs[key] = surface
+        return self.tile_backs[key]
+
+    def tile_state(self, i):
+        # what the tile looks like this frame, used to find the tiles that need a redraw
+        if self.engine.is_face_up(i):
+            return self.flip_animation.frame(self.flip_progress[i])
+        return None
+
+    def update_board(self, dt):
+        duration = self.voice_flip_duration if self.voice_control_mode else self.flip_duration
+        for i in range(len(self.rects)):
+            if self.engine.is_face_up(i):
+                if self.flip_progress[i] < 1:
+                    self.flip_progress[i] = min(1.0, self.flip_progress[i] + dt / duration)
+            else:
+                self.flip_progress[i] = 0.0
+
     def draw_board(self):
         for i, rect in enumerate(self.rects):
-            if self.revealed[i] or i in self.matched:
-                if not self.is_fliping[i]:
-                    # flip revealed tile
-                    if self.combined_images[i][len(self.combined_images[i])-1] < (len(self.combined_images[i])-1)*100:
-                        self.screen.blit(self.combined_images[i][int((self.combined_images[i][len(self.combined_images[i])-1])/100)], rect.topleft)
-                        jump = 1
-                        if self.voice_control_mode == True:
-                            jump = 50
-                        self.combined_images[i][len(self.combined_images[i])-1] += jump
-                    else:
-                        self.screen.blit(self.combined_images[i][len(self.combined_images[i])-2], rect.topleft)
-                else:
-                    self.is_fliping[i] = False
+            if self.engine.is_face_up(i) and self.flip_animation.frame(self.flip_progress[i]) == self.flip_animation.frames - 1:
+                # turned over, the face at the tile's size
+                self.screen.blit(self.card_texture(self.engine.deck[i], rect.size), rect.topleft)
+            elif self.engine.is_face_up(i):
+                # flip revealed tile, one frame from the baked sprite sheets
+                self.flip_animation.draw(self.screen, rect.topleft, self.flip_progress[i],
+                                         (i, self.current_player.color), self.tile_back(i),
+                                         self.card_face_key(self.engine.deck[i]), self.card_texture(self.engine.deck[i]))
             else:
-                self.combined_images[i][len(self.combined_images[i])-1] = 0
-                # Draw a black rectangle (or some background) for hidden tiles
-                pygame.draw.rect(self.screen, self.current_player.color, rect, 0, 10)
-                text_surface = self.font.render(str(i+1), True, (255, 255, 255))
-                # Center the text on the button
-                text_rect = text_surface.get_rect(center=rect.center)
-                self.screen.blit(text_surface, text_rect)
+                self.screen.blit(self.tile_back(i), rect.topleft)
 
         self.rest_button.draw(self.screen)
         self.help_button.draw(self.screen)
+        if self.show_heatmap:
+            self.draw_heatmap()
+
+    def draw_heatmap(self):
+        # one cell per card still on the board, warmer the more pairs are left
+        x, y = self.heatmap_rect.topleft
+        size = self.heatmap_rect.height
+        for card, pairs in sorted(self.engine.remaining_pairs().items()):
+            if x + size * 2 > self.heatmap_rect.right:
+                break
+            heat = min(255, 60 + 50 * pairs)
+            pygame.draw.rect(self.screen, (heat, 80, 255 - heat), (x, y, size * 2 - 4, size), 0, 6)
+            self.screen.blit(self.card_texture(card, (size - 6, size - 6)), (x + 3, y + 3))
+            count = text_cache.render(None, max(8, round(28 * self.ui_scale)), str(pairs), (255, 255, 255))
+            self.screen.blit(count, count.get_rect(center=(x + size + (size - 4) // 2, y + size // 2)))
+            x += size * 2
+
+    def card_texture(self, card, size=None):
+        return self.textures.texture(self.deck, self.card_faces[card], size)
+
+    def card_face_key(self, card):
+        # flip sheets are keyed by the face, card ids mean other faces after the next deal
+        return self.deck.name, self.card_faces[card]
+
+    def face_count(self):
+        # distinct cards on the board: one per pair while the deck has enough faces
+        return min(len(self.deck), len(self.rects) // 2)
 
     #def win_menu(self):
         # self.draw_backgrounds()
         #self.play_again_button.draw(self.screen)
 
+    def set_grid(self, grid_size):
+        # lays out a columns x rows board, any even number of tiles works with any number of card faces
+        columns, rows = grid_size
+        if columns * rows % 2:
+            raise ValueError(f'a {columns}x{rows} board has an odd number of tiles')
+        self.grid_size = grid_size
+        self.layout_board()
+        # how far each tile has turned, 0 is face down and 1 face up
+        self.flip_progress = [0.0] * len(self.rects)
+        # the rules run headless in the engine, its deck holds card ids that index card_faces
+        self.engine = MemoryEngine(len(self.rects), self.face_count(), self.game_mode)
+        self.card_faces = self.deck.deal(self.engine.faces, random.Random(0))
+        self.board_button.text = f'Board: {columns}x{rows}'
+        # the voice grammar depends on the number of tiles, the worker builds its decoder at the next start
+        self.voice_control_stop()
+        if self.voice_worker is not None:
+            self.voice_worker.max_number = len(self.rects)
+        self.compositor.regions.clear()
+        self.compositor.mark_all()
+
+    def layout_board(self):
+        # the tiles for the current board area, a resize calls this without touching the game
+        columns, rows = self.grid_size
+        self.rect_width = self.board_area.width // columns
+        self.rect_height = self.board_area.height // rows
+        gap = min(20, self.rect_width // 5, self.rect_height // 5)
+        self.rects = [pygame.Rect(x * self.rect_width + self.board_area.x, y * self.rect_height + self.board_area.y,
+                                  self.rect_width - gap, self.rect_height - gap)
+                      for x in range(columns) for y in range(rows)]
+        self.tile_font_size = min(self.font_size, int(self.rects[0].height * 0.45))
+        key = (self.rects[0].size, len(self.rects))
+        if key != self.flip_animation_key:
+            self.flip_animation = FlipAnimation(self.rects[0].size)
+            self.flip_animation_key = key
+        self.tile_backs = {}
+
+    def layout(self, size):
+        # every position and font size follows the window: the 700x500 layout scaled by the tighter axis,
+        # with the board taking whatever room is left
+        width, height = size
+        self.screen_width, self.screen_height = width, height
+        scale = self.ui_scale = min(width / self.base_size[0], height / self.base_size[1])
+
+        def scaled(n):
+            return max(1, round(n * scale))
+
+        self.board_area = pygame.Rect(scaled(60), scaled(60), width - scaled(120), height - scaled(100))
+        # the main menu's three rows of buttons, centred
+        button_width, button_height, gap = scaled(200), scaled(50), scaled(10)
+        left = (width - 3 * button_width - 2 * gap) // 2
+        top = height // 3
+        for button, column, row in [(self.main_menu.buttons[0], 0, 0), (self.main_menu.buttons[1], 1, 0),
+                                    (self.main_menu.buttons[2], 2, 0), (self.board_button, 0, 1), (self.voice_button, 1, 1),
+                                    (self.computer_button, 0, 2), (self.difficulty_button, 1, 2), (self.scores_button, 2, 2)]:
+            button.place(left + column * (button_width + gap), top + row * (button_height + gap), button_width, button_height, scale)
+        self.main_menu.resize(width, height, scale)
+        self.win_menu.resize(width, height, scale)
+        self.rest_button.place(scaled(10), height - scaled(40), scaled(100), scaled(30), scale)
+        self.help_button.place(width // 2 - scaled(150), scaled(20), scaled(300), scaled(30), scale)
+        self.play_again_button.place(width // 2 - scaled(100), height - scaled(100), scaled(200), scaled(100), scale)
+        self.Mute_button.place(width - scaled(40), scaled(10), scaled(30), scaled(30), scale)
+        self.heatmap_rect = pygame.Rect(scaled(120), height - scaled(42), width - scaled(170), scaled(34))
+        self.timer_position = (scaled(5), scaled(5))
+        self.font_size = scaled(36)
+        self.font = text_cache.font(self.font_face, self.font_size)
+        self.net_stats_position = (scaled(5), scaled(42))
+        self.net_font_size = scaled(18)
+
+    def resize(self, size, fullscreen=False):
+        # for a window resize and F11; scaled images, fonts and flip sheets are made again on first use
+        # at the new size and kept in their caches, so nothing is scaled per frame
+        self.fullscreen = fullscreen
+        if fullscreen:
+            self.screen = pygame.display.set_mode(size, pygame.FULLSCREEN)
+        else:
+            size = (max(size[0], self.min_size[0]), max(size[1], self.min_size[1]))
+            self.screen = pygame.display.set_mode(size, pygame.RESIZABLE)
+        self.layout(self.screen.get_size())
+        self.layout_board()
+        self.background_surface = None
+        self.compositor.screen = self.screen
+        self.compositor.regions.clear()
+        self.compositor.mark_all()
+        if self.recorder is not None:
+            # clicks after this are in the new layout
+            self.recorder.layout(self.screen.get_size(), self.board_area, self.help_button.rect, self.rest_button.rect)
+
+    def toggle_fullscreen(self):
+        if self.fullscreen:
+            self.resize(self.window_size)
+        else:
+            self.window_size = self.screen.get_size()
+            self.resize(pygame.display.get_desktop_sizes()[0], fullscreen=True)
+
+    def tile_at(self, pos):
+        # constant time hit test: the cell comes from arithmetic, then the gap around the tile is excluded
+        column = (pos[0] - self.board_area.x) // self.rect_width
+        row = (pos[1] - self.board_area.y) // self.rect_height
+        if 0 <= column < self.grid_size[0] and 0 <= row < self.grid_size[1]:
+            i = int(column * self.grid_size[1] + row)
+            if self.rects[i].collidepoint(pos):
+                return i
+        return None
+
+    @property
+    def current_player(self):
+        return self.players[self.engine.current_player]
+
     def add_player(self):
         if self.game_mode ==2:
             self.players.append(Player(1, 0,(255, 0, 0)))
             self.players[0].color = (0, 0, 255)
 
-    def check_events(self):
-        for event in pygame.event.get():
+    def check_events(self, events=None):
+        if events is None:
+            events = pygame.event.get()
+        new_size = None
+        for event in events:
+            if event.type in (pygame.QUIT, pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN, pygame.VIDEORESIZE):
+                if self.replaying and not getattr(event, 'replayed', False):
+                    # only the log drives a replay, but closing the window, a signal or Esc still end it
+                    if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                        return False
+                    continue
+                if self.recorder is not None and event.type != pygame.VIDEORESIZE:
+                    self.record(event)  # resize() logs the layout instead
             if event.type == pygame.QUIT:
                 return False
+            elif event.type == pygame.VIDEORESIZE:
+                # dragging a window edge sends many, only the last one of a frame is laid out
+                if not self.fullscreen:
+                    new_size = event.size
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+                self.toggle_fullscreen()
+                new_size = None
+            elif event.type == VOICE_COMMAND_EVENT and hasattr(event, 'command'):
+                # a replayed voice command, live ones are read from the voice worker
+                if self.voice_control_mode:
+                    self.voice_command(event.command)
+            elif event.type == HIDE_MISMATCH_EVENT:
+                self.hide_non_matches()
+            elif event.type == HIDE_HELP_EVENT:
+                self.hide_non_matches_help()
+            elif event.type == COMPUTER_MOVE_EVENT:
+                self.computer_move()
+            elif event.type == NET_EVENT:
+                self.net_read()
+            elif event.type == SCORES_EVENT:
+                if self.show_scores:
+                    self.scores_lines = event.lines
+            elif event.type == TIMER_TICK_EVENT:
+                self.net_send(TIMER, pygame.time.get_ticks() - self.start_ticks)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+                self.show_heatmap = not self.show_heatmap
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                # debugging aid: switch between dirty-rectangle and full-screen redraws
+                self.compositor.full_redraw = not self.compositor.full_redraw
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.show_profiler_hud = not self.show_profiler_hud
+                profiler.set_enabled(self.show_profiler_hud or self.profile)
+                self.compositor.forget('profiler')
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.dump_profile()
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                if self.in_main_menu:
+                if self.in_main_menu and self.is_net_client():
+                    # the host starts games, the menu waits for its deal
+                    if self.Mute_button.is_clicked(event.pos):
+                        audio.toggle_mute()
+                elif self.in_main_menu and self.show_scores:
+                    self.show_scores = False  # any click goes back to the menu
+                elif self.in_main_menu:
                     if self.Mute_button.is_clicked(event.pos):
-                        if(not self.sound_paused):
-                            self.is_mute = True
-                        else:
-                            self.is_mute = False
+                        audio.toggle_mute()
+                    if self.board_button.is_clicked(event.pos):
+                        # cycle through the board sizes
+                        index = self.board_sizes.index(self.grid_size) if self.grid_size in self.board_sizes else -1
+                        self.set_grid(self.board_sizes[(index + 1) % len(self.board_sizes)])
+                    if self.difficulty_button.is_clicked(event.pos):
+                        levels = list(DIFFICULTIES)
+                        self.computer_difficulty = levels[(levels.index(self.computer_difficulty) + 1) % len(levels)]
+                        self.difficulty_button.text = f'Level: {self.computer_difficulty}'
                     if self.main_menu.button_is_clicked("Time Attack", event.pos):
                         self.game_mode = 1  # Assuming single player for Time Attack
                         self.time_attack_mode = True
-                        self.time_limit = 60  # Reset time limit for the first round
+                        self.engine.start_time_attack(60)  # Reset time limit for the first round
                         self.in_main_menu = False
                     elif self.main_menu.button_is_clicked("1 Player",event.pos):
                         self.game_mode = 1
@@ -332,12 +722,29 @@ class MemoryGame:
                         self.add_player()
                         self.time_attack_mode = False
                         self.in_main_menu = False
+                        # played against the joined machine when there is one
+                        self.net_game = isinstance(self.net, NetServer) and self.net.is_connected()
+                        if self.net_game:
+                            # a reset on one machine would leave the other on the old board
+                            self.rest_button.button_disable()
+                    elif self.main_menu.button_is_clicked("vs Computer", event.pos):
+                        self.game_mode = 2
+                        self.add_player()
+                        self.time_attack_mode = False
+                        self.in_main_menu = False
+                        self.computer_start()
+                    elif self.main_menu.button_is_clicked("Scores", event.pos):
+                        self.open_scores()
                     # Check if Voice Control button is clicked
                     elif self.main_menu.button_is_clicked("Voice Control", event.pos):
                         self.game_mode = 1
                         self.time_attack_mode = False
                         self.in_main_menu = False
                         self.voice_control_mode = True
+                        self.voice_control_start()
+                    if not self.in_main_menu:
+                        self.deal(self.game_mode)
+                        self.start_game_clock()
                 elif not self.game_end and self.help_button.is_clicked(event.pos):
                     self.help_button.button_disable()
                     self.reveal_a_pair()
@@ -347,196 +754,584 @@ class MemoryGame:
                 elif not self.game_end and self.rest_button.is_clicked(event.pos):
                     self.time_attack_mode = False
                     self.restart_game()
-                elif not self.game_end and len(self.selected) < 2 and not self.waiting_to_hide:
+                elif not self.game_end:
                     self.handle_click(event.pos)
+        if new_size is not None and tuple(new_size) != self.screen.get_size():
+            self.resize(new_size)
         return True
 
     def restart_game(self):
-        self.revealed = [False] * len(self.rects)
-        self.selected = []
-        self.matched = []
         self.game_end = False
-        self.waiting_to_hide = False
         self.voice_control_mode = False
+        self.voice_control_stop()
+        if not self.time_attack_mode:
+            self.finish_run(False)  # left before the end
+        self.computer_stop()
+        self.net_game = False
         if not self.time_attack_mode:
             self.in_main_menu = True
-        self.current_player = Player(0)
-        self.players  = [self.current_player]
-        self.last_check_time = 0
-        random.shuffle(self.combined_images)
-        random.shuffle(self.images)
+        self.players  = [Player(0)]
+        pygame.time.set_timer(HIDE_MISMATCH_EVENT, 0)
+        pygame.time.set_timer(HIDE_HELP_EVENT, 0)
         self.help_button.button_enable()
-        self.current_player = self.players[0]
+        self.rest_button.button_enable()
         # Timer
-        self.start_ticks = pygame.time.get_ticks()
         if self.time_attack_mode:
-            self.time_limit = max(10, self.time_limit - 5)  # Example: decrease time limit, but no less than 10 seconds
-            self.start_ticks = pygame.time.get_ticks()  # Reset the timer
+            self.deal(next_round=True)  # decrease time limit, but no less than 10 seconds
+            self.start_game_clock()  # Reset the timer
+        else:
+            self.engine.time_attack = False
+            self.engine.new_game(1)
+            self.start_ticks = pygame.time.get_ticks()
+            pygame.time.set_timer(TIMER_TICK_EVENT, 0)
 
-    def handle_click(self, pos):
-        for i, rect in enumerate(self.rects):
-            if rect.collidepoint(pos) and i not in self.matched and i not in self.selected:
-                self.selected.append(i)
-                self.revealed[i] = True
-                self.is_fliping[i] = True
-                self.flip_sound.play()
-                if len(self.selected) == 2:
-                    self.check_match()
-
-    def check_match(self):
-        if self.combined_images[self.selected[0]][0] != self.combined_images[self.selected[1]][0]:
-            self.waiting_to_hide = True
-            self.last_check_time = time.time()
-            self.current_player = self.players[(self.current_player.player_number + 1) % self.game_mode]
+    def deal(self, players=None, next_round=False):
+        # a fresh deal seeded from the game's generator and logged, so replay.py can deal it again
+        seed = self.rng.getrandbits(64)
+        self.engine.rng.seed(seed)
+        if next_round:
+            self.engine.next_round()
         else:
-            self.match_sound.play()
-            self.matched.extend(self.selected)
-            self.selected = []
-    
-    def check_match_help(self):
-        self.waiting_to_hide_help = True
-        self.last_check_time = time.time()
+            self.engine.new_game(players)
+        # which faces of the deck this deal shows follows from the same seed
+        self.card_faces = self.deck.deal(self.engine.faces, random.Random(seed))
+        self.textures.preload(self.deck, self.card_faces)
+        if self.recorder is not None:
+            self.recorder.game_start(seed, self.grid_size, self.engine.faces, self.engine.players, self.time_attack_mode,
+                                     self.computer is not None, self.engine.time_limit, self.hide_delay, self.board_area,
+                                     self.help_button.rect, self.rest_button.rect)
+        self.remote_help_used = False
+        self.net_message = None
+        self.net_send(DEAL, *self.grid_size, self.engine.faces, self.engine.players, self.time_attack_mode, self.engine.time_limit)
+        self.net_send(TURN, self.engine.current_player)
+        if next_round and self.game_run is not None:
+            self.game_run['round'] += 1
+        else:
+            self.start_run()
+
+    def mode_name(self):
+        if self.net_game or self.is_net_client():
+            return 'Network'
+        if self.time_attack_mode:
+            return TIME_ATTACK
+        if self.computer is not None:
+            return 'vs Computer'
+        if self.voice_control_mode:
+            return 'Voice Control'
+        return '2 Players' if self.game_mode == 2 else '1 Player'
+
+    def start_run(self):
+        self.game_run = {'mode': self.mode_name(), 'moves': 0, 'mismatches': 0, 'help_uses': 0, 'seconds': 0.0, 'round': 1}
+
+    def add_deal_to_run(self):
+        run = self.game_run
+        if run is not None:
+            run['moves'] += self.engine.moves
+            run['mismatches'] += self.engine.mismatches
+            run['help_uses'] += self.engine.help_uses
+            run['seconds'] += (pygame.time.get_ticks() - self.start_ticks) / 1000
+
+    def finish_run(self, won):
+        # queues the result, the stats writer thread stores it
+        run = self.game_run
+        if run is None:
+            return
+        self.add_deal_to_run()
+        self.game_run = None
+        if self.replaying:
+            return
+        self.stats.record_game(self.player_name, run['mode'], self.grid_size, won, run['moves'], run['mismatches'], run['help_uses'],
+                               run['seconds'], run['round'] if run['mode'] == TIME_ATTACK else None, self.players[0].score,
+                               self.players[1].score if len(self.players) > 1 else None)
+
+    def open_scores(self):
+        # read on the stats writer thread after the game that just ended is written, shown when it arrives
+        grid_size, player_name = self.grid_size, self.player_name
+        self.scores_lines = (('Loading scores', (255, 255, 0)),)
+        self.show_scores = True
+        self.stats.request(lambda store: self.scores_text(store, grid_size, player_name),
+                           lambda lines: pygame.event.post(pygame.event.Event(SCORES_EVENT, lines=lines)))
+
+    @staticmethod
+    def scores_text(store, grid_size, player_name):
+        size = f'{grid_size[0]}x{grid_size[1]}'
+        white, yellow = (255, 255, 255), (255, 255, 0)
+        lines = [(f'Fastest on {size}', yellow)]
+        for rank, (player, seconds, moves, _) in enumerate(store.leaderboard('1 Player', grid_size), 1):
+            lines.append((f'{rank}. {player}  {int(seconds) // 60}:{int(seconds) % 60:02}  {moves} moves', white))
+        lines.append((f'Time Attack on {size}', yellow))
+        for rank, (player, seconds, moves, round) in enumerate(store.leaderboard(TIME_ATTACK, grid_size), 1):
+            lines.append((f'{rank}. {player}  round {round}', white))
+        best = store.personal_best(player_name, '1 Player', grid_size)
+        best_text = f'{int(best[0]) // 60}:{int(best[0]) % 60:02}' if best else '-'
+        lines.append((f'{player_name}: best {best_text}, {store.games_played(player_name)} games', yellow))
+        return tuple(lines)
+
+    def draw_scores(self):
+        self.draw_backgrounds()
+        scale = self.ui_scale
+        y = round(40 * scale)
+        for text, color in self.scores_lines:
+            surface = text_cache.render(None, round(30 * scale), text, color)
+            self.screen.blit(surface, surface.get_rect(midtop=(self.screen_width // 2, y)))
+            y += round(32 * scale)
+        hint = text_cache.render(None, round(24 * scale), 'click to go back', (200, 200, 200))
+        self.screen.blit(hint, hint.get_rect(midbottom=(self.screen_width // 2, self.screen_height - round(10 * scale))))
+
+    def record(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            self.recorder.mouse(event.pos, event.button)
+        elif event.type == pygame.KEYDOWN:
+            self.recorder.key(event.key)
+        else:
+            self.recorder.quit()
+
+    def start_game_clock(self):
+        self.start_ticks = pygame.time.get_ticks()
+        # the timer text only changes once a second, wake up for it
+        pygame.time.set_timer(TIMER_TICK_EVENT, 1000)
+
+    def handle_click(self, pos):
+        if self.is_computer_turn() or self.is_remote_turn():
+            return
+        if self.is_net_client() and self.engine.current_player != REMOTE_PLAYER:
+            return
+        i = self.tile_at(pos)
+        if i is not None:
+            self.select_tile(i)
+
+    def select_tile(self, i):
+        if self.is_net_client():
+            # the host decides, the flip arrives as a delta
+            if self.engine.can_select(i):
+                self.net.send(SELECT, i)
+            return
+        first = self.engine.selected[0] if self.engine.selected else None
+        result = self.engine.select(i)
+        if result is None:
+            return
+        for message in select_messages(self.engine, i, result, first):
+            self.net_send(*message)
+        audio.play('flip')
+        if self.computer is not None:
+            # the computer watches every flip, its own and the human's
+            self.computer.observe(i, self.engine.deck[i])
+        if result == MATCH:
+            audio.play('match')
+            self.current_player.update_score(1)
+            if self.computer is not None:
+                self.computer.remove(first)
+                self.computer.remove(i)
+        elif result == MISMATCH:
+            pygame.time.set_timer(HIDE_MISMATCH_EVENT, self.hide_delay, 1)
+        self.schedule_computer_move()
 
     def hide_non_matches(self):
-        if time.time() - self.last_check_time >= 0.5:
-            for i in self.selected:
-                self.revealed[i] = False
-            self.selected = []
-            self.waiting_to_hide = False
+        if not self.engine.hide_mismatch():
+            return
+        self.net_send(HIDE)
+        self.schedule_computer_move()
+
+    def computer_start(self):
+        # decisions are made on the worker's thread, the game only polls for them
+        self.computer_stop()
+        seed = self.computer_seed if self.computer_seed is not None else self.rng.getrandbits(64)
+        self.computer = ComputerWorker(ComputerPlayer(len(self.rects), self.computer_difficulty, seed))
+
+    def computer_stop(self):
+        if self.computer is not None:
+            self.computer.stop()
+            self.computer = None
+        self.computer_waiting = False
+        pygame.time.set_timer(COMPUTER_MOVE_EVENT, 0)
+
+    def is_computer_turn(self):
+        return self.computer is not None and self.engine.current_player == 1
+
+    def schedule_computer_move(self):
+        # after every flip and hide: on the computer's turn ask for a tile now, flip it after the think delay
+        if (self.is_computer_turn() and not self.computer_waiting and not self.engine.pending_hide
+                and not self.engine.is_won() and not self.game_end):
+            first = self.engine.selected[0] if self.engine.selected else None
+            self.computer.request_move(first)
+            self.computer_waiting = True
+            pygame.time.set_timer(COMPUTER_MOVE_EVENT, self.computer.player.think_ms, 1)
+
+    def computer_move(self):
+        if not self.computer_waiting:
+            return
+        move = self.computer.get_move()
+        if move is None:
+            # still deciding, look again shortly
+            pygame.time.set_timer(COMPUTER_MOVE_EVENT, 5, 1)
+            return
+        self.computer_waiting = False
+        if not self.game_end:
+            if self.recorder is not None:
+                self.recorder.computer(move)
+            self.select_tile(move)
 
     def hide_non_matches_help(self):
-        if time.time() - self.last_check_time >= 0.9:
-            for i in self.selected_for_help:
-                self.revealed[i] = False
-            self.selected_for_help = []
-            self.waiting_to_hide_help = False
+        self.engine.hide_help()
+        self.net_send(HIDE_HELP)
 
     def check_win_condition(self):
-        if len(self.matched) == len(self.rects) and not self.game_end:
+        if self.engine.is_won() and not self.game_end:
             if self.time_attack_mode:
                 # Logic to restart the game with a shorter time limit
+                self.add_deal_to_run()
                 self.restart_game()
             else:
                 self.game_end = True
+                self.finish_run(True)
 
     def reveal_a_pair(self):
-        # Find a pair that has not been revealed or matched yet
-        for i, image1 in enumerate(self.combined_images):
-            if not self.revealed[i] and i not in self.matched:
-                for j, image2 in enumerate(self.combined_images):
-                    if i != j and image1[0] == image2[0] and not self.revealed[j] and j not in self.matched:
-                        # Temporarily reveal the pair
-                        self.revealed[i] = True
-                        self.revealed[j] = True
-                        self.flip_sound.play()
-
-                        self.selected_for_help.append(i)
-                        self.selected_for_help.append(j)
-                        self.check_match_help()
-                        
-
-                        return  # Exit after revealing one pair
+        # Temporarily reveal a pair that has not been revealed or matched yet
+        if self.is_net_client():
+            self.net.send(HELP_REQUEST)
+            return
+        pair = self.engine.help_pair()
+        if pair is not None:
+            audio.play('flip')
+            self.net_send(HELP_PAIR, pair[0], self.engine.deck[pair[0]], pair[1], self.engine.deck[pair[1]])
+            if self.computer is not None:
+                for i in pair:
+                    self.computer.observe(i, self.engine.deck[i])
+            pygame.time.set_timer(HIDE_HELP_EVENT, self.help_hide_delay, 1)
+
+    def host(self, port):
+        # the next "2 Players" game is played against the machine that joins on port
+        self.net = NetServer(notify=lambda: pygame.event.post(pygame.event.Event(NET_EVENT)))
+        self.net.start(port=port)
+
+    def join(self, address, port):
+        # play as player 2 on a hosted board
+        self.net = NetClient(notify=lambda: pygame.event.post(pygame.event.Event(NET_EVENT)))
+        self.net.connect(address, port)
+
+    def is_net_client(self):
+        return isinstance(self.net, NetClient)
+
+    def is_remote_turn(self):
+        return self.net_game and self.engine.current_player == REMOTE_PLAYER
+
+    def net_send(self, kind, *values):
+        # the host's deltas, only while a network game runs
+        if self.net_game:
+            self.net.send(kind, *values)
+
+    def net_read(self):
+        if self.net is None:
+            return
+        for kind, values in self.net.get_messages():
+            if kind == DISCONNECTED:
+                if self.is_net_client():
+                    self.host_lost()
+                    return
+                if self.net_game:
+                    self.time_attack_mode = False
+                    self.restart_game()
+            elif kind == SELECT:
+                if self.is_remote_turn() and not self.game_end:
+                    self.select_tile(values[0])
+            elif kind == HELP_REQUEST:
+                if self.net_game and not self.game_end and not self.remote_help_used:
+                    self.remote_help_used = True
+                    self.reveal_a_pair()
+            elif kind == DEAL:
+                self.net_deal(*values)
+            elif kind == TIMER:
+                self.start_ticks = pygame.time.get_ticks() - values[0]
+            elif self.is_net_client() and isinstance(self.engine, MirrorEngine):
+                self.engine.apply(kind, values)
+                if kind in (FLIP, HELP_PAIR):
+                    audio.play('flip')
+                elif kind == MATCHED:
+                    audio.play('match')
+                    self.players[values[2]].update_score(1)
+
+    def host_lost(self):
+        # the joined host has gone and its board with it: back to the menu, which plays local games again
+        self.net.close()
+        self.net = None
+        self.net_message = 'net: host disconnected'
+        self.time_attack_mode = False
+        if not self.in_main_menu:
+            self.restart_game()
+        self.engine = MemoryEngine(len(self.rects), self.face_count(), self.game_mode)
+
+    def net_text(self):
+        return self.net.stats_text() if self.net is not None else self.net_message
+
+    def net_deal(self, columns, rows, faces, players, time_attack, time_limit):
+        # the client's board for the host's new deal
+        if (columns, rows) != self.grid_size:
+            self.set_grid((columns, rows))
+        self.engine = MirrorEngine(columns * rows, faces, players)
+        self.engine.time_limit = time_limit
+        # the host's faces aren't sent, pairs are shown with this machine's deck
+        self.card_faces = self.deck.deal(faces, random.Random(0))
+        self.textures.preload(self.deck, self.card_faces)
+        self.game_mode = players
+        self.players = [Player(0)]
+        self.add_player()
+        self.time_attack_mode = time_attack
+        self.in_main_menu = False
+        self.game_end = False
+        self.help_button.button_enable()
+        self.rest_button.button_disable()  # the host ends or restarts network games
+        self.start_game_clock()
+        self.start_run()
 
     def voice_control_start(self):
-        # Setup for voice recognition
-        rec = KaldiRecognizer(self.model, 16000)
-        p = pyaudio.PyAudio()
-        stream = p.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=8000)
-        stream.start_stream()
-        self.stream_start = True
+        # capture and recognition run on a background thread, the game only drains the queue
+        if self.replaying:
+            return  # commands come from the log
+        if self.voice_worker is None:
+            vad = EnergyVad(**self.voice_vad_thresholds) if self.voice_vad_thresholds else None
+            self.voice_worker = VoiceWorker(self.model_loader.model, len(self.rects), use_grammar=self.voice_use_grammar, vad=vad,
+                                            notify=lambda: pygame.event.post(pygame.event.Event(VOICE_COMMAND_EVENT)))
+        self.voice_worker.start()
+
+    def update_voice_button(self):
+        # enable the Voice Control button once the background load has finished
+        if self.replaying and self.voice_button.text == 'Loading voice...':
+            # a replay needs no model, the recognised commands are in the log
+            self.voice_button.text = 'Voice Control'
+            self.voice_button.button_enable()
+        if self.voice_button.disabled and self.model_loader.is_done() and self.voice_button.text == 'Loading voice...':
+            self.mark_startup('voice_model_ready')
+            if self.model_loader.is_ready():
+                self.voice_button.text = 'Voice Control'
+                self.voice_button.button_enable()
+            else:
+                self.voice_button.text = 'Voice unavailable'
 
-        #print("Voice control mode started. Say a card number to flip...")
-        return rec, stream
+    def print_asset_report(self):
+        assets.print_report(others=self.textures.report())
 
+    def mark_startup(self, name):
+        if name not in self.startup_marks:
+            self.startup_marks[name] = time.perf_counter() - process_start
+            if os.environ.get('MEMORYGAME_STARTUP_LOG'):
+                print(f'startup: {name} at {self.startup_marks[name] * 1000:.0f} ms', file=sys.stderr)
 
-    def voice_control_read(self, stream, rec):
-        data = stream.read(4000, exception_on_overflow=False)
-        if len(data) == 0:
+    def voice_control_stop(self):
+        if self.voice_worker is not None:
+            self.voice_worker.stop()
+
+    def voice_control_read(self):
+        if self.voice_worker is None:
             return
-        if rec.AcceptWaveform(data):
-            result = json.loads(rec.Result())
-            #print(result)
-            if 'text' in result:
-                try:
-                    card_number = self.number_words.get(result['text'].lower(), None)
-
-                    if card_number is not None and 1 <= card_number <= len(self.rects):
-                        self.handle_click(self.number_to_tile_pos(card_number))
-                except ValueError:
-                    pass
+        for command in self.voice_worker.get_commands():
+            if self.voice_command(command) is False:
+                return
+
+    def voice_command(self, command):
+        # returns False when the rest of the queued commands should be dropped
+        if self.recorder is not None:
+            self.recorder.voice(command)
+        if command == 'help':
+            if not self.game_end and not self.help_button.disabled:
+                self.help_button.button_disable()
+                self.reveal_a_pair()
+        elif command == 'reset':
+            if not self.rest_button.disabled:
+                self.time_attack_mode = False
+                self.restart_game()
+                return False
+        elif command == 'mute':
+            audio.toggle_mute()
+        # commands spoken while a pair is still showing are dropped, like clicks
+        elif not self.game_end and 1 <= command <= len(self.rects):
+            self.handle_click(self.number_to_tile_pos(command))
 
     def number_to_tile_pos(self, tile_number):
-        for i, rect in enumerate(self.rects):
-            if(tile_number == i+1):
-                return rect.center
+        return self.rects[tile_number - 1].center
 
-    def display_timer(self):
+    def timer_text(self):
+        if self.time_attack_mode:
+            remaining_time = self.engine.time_limit - (pygame.time.get_ticks() - self.start_ticks) // 1000
+            return f'Time Left: {max(0, remaining_time)}', (255, 0, 0) if remaining_time <= 10 else (0, 255, 0)
         if not self.game_end:
             self.elapsed_ticks = pygame.time.get_ticks() - self.start_ticks
         elapsed_seconds = self.elapsed_ticks // 1000
-        timer_text = f'Time: {elapsed_seconds // 60}:{elapsed_seconds % 60:02}'
-        timer_surface = self.font.render(timer_text, True, (0, 255, 0))
-        self.screen.blit(timer_surface, (5, 5))
+        return f'Time: {elapsed_seconds // 60}:{elapsed_seconds % 60:02}', (0, 255, 0)
 
-    def display_time_attack_timer(self):
-        if self.time_attack_mode:
-            remaining_time = self.time_limit - (pygame.time.get_ticks() - self.start_ticks) // 1000
+    def display_timer(self):
+        timer_text, color = self.timer_text()
+        # composed from cached per-digit glyphs instead of rendering the whole string every second
+        text_cache.draw_glyphs(self.screen, self.timer_position, self.font_face, self.font_size, timer_text, color)
+
+    def update_time_attack(self):
+        if self.time_attack_mode and not self.in_main_menu and not self.game_end:
+            remaining_time = self.engine.time_limit - (pygame.time.get_ticks() - self.start_ticks) // 1000
             if remaining_time <= 0:
                 # Handle game over due to time running out
-                self.game_end = True 
-                self.Lose_sound.play()
-                # Here you could also trigger a transition to show the player's score or a "time's up" message
-            timer_text = f'Time Left: {max(0, remaining_time)}'
-            if remaining_time <= 10:
-                timer_surface = self.font.render(timer_text, True, (255, 0, 0))
-            else:
-                timer_surface = self.font.render(timer_text, True, (0, 255, 0))
-            self.screen.blit(timer_surface, (5, 5))
+                self.game_end = True
+                audio.play('lose')
+                self.finish_run(False)
+
+    def is_animating(self):
+        if self.in_main_menu or self.game_end:
+            return True  # the pulsing titles
+        for i in range(len(self.rects)):
+            if (self.engine.is_face_up(i)) and self.flip_progress[i] < 1:
+                return True
+        return False
+
+    def wait_for_events(self):
+        # sleep until input, a scheduled timer or a voice command arrives
+        event = pygame.event.wait(self.idle_timeout)
+        events = [] if event.type == pygame.NOEVENT else [event]
+        return events + pygame.event.get()
+
+    def update(self, dt):
+        # one fixed step of dt seconds for everything that animates
+        self.update_board(dt)
+        if self.in_main_menu:
+            self.main_menu.update(dt)
+        if self.game_end:
+            self.win_menu.update(dt)
+
+    def draw_scene(self, alpha):
+        self.screen.fill(self.background_color)
+        self.draw_backgrounds()
+        profiler.start('draw_board')
+        self.draw_board()
+        profiler.stop('draw_board')
+        profiler.start('menus')
+        if self.in_main_menu and self.show_scores:
+            self.draw_scores()
+        elif self.in_main_menu:
+            self.main_menu.draw(self.screen, False, alpha)
+            self.Mute_button.draw(self.screen)
+        if self.game_end:
+            self.win_menu.draw(self.screen, True, alpha)
+        profiler.stop('menus')
+        if not self.in_main_menu:
+            self.display_timer()
+        if self.show_profiler_hud:
+            profiler.draw_hud(self.screen, self.profiler_hud_topright())
+        net_text = self.net_text()
+        if net_text:
+            text_cache.draw_glyphs(self.screen, self.net_stats_position, None, self.net_font_size, net_text, (255, 255, 0))
+
+    def profiler_hud_topright(self):
+        return self.screen_width - round(5 * self.ui_scale), round(45 * self.ui_scale)
+
+    def dump_profile(self):
+        if profiler.trace:
+            events = profiler.dump_trace(self.trace_path)
+            print(f'profiler: {events} events written to {self.trace_path}', file=sys.stderr)
+
+    def render(self, alpha):
+        # alpha is how far we are between the last two fixed steps
+        compositor = self.compositor
+        scene = (self.in_main_menu, self.game_end, self.current_player.color,
+                 self.help_button.disabled, self.rest_button.disabled, self.voice_button.text, self.voice_button.disabled, self.board_button.text,
+                 self.difficulty_button.text, self.show_scores and self.scores_lines)
+        if compositor.track('scene', self.screen.get_rect(), scene):
+            # the whole screen changed, no need to look at the parts
+            compositor.mark_all()
+        for i, rect in enumerate(self.rects):
+            compositor.track(('tile', i), rect, self.tile_state(i))
+        if self.in_main_menu:
+            compositor.forget('timer')
+            compositor.track('title', self.main_menu.pulsing_text_rect(alpha), self.main_menu.pulsing_text_font_size(alpha))
+        else:
+            timer_text, color = self.timer_text()
+            compositor.track('timer', pygame.Rect(self.timer_position, text_cache.glyphs_size(self.font_face, self.font_size, timer_text)), (timer_text, color))
+            # the pairs left are only looked at while the heatmap is shown
+            heatmap = (tuple(sorted(self.engine.remaining_pairs().items())), self.card_faces) if self.show_heatmap else None
+            compositor.track('heatmap', self.heatmap_rect, heatmap)
+        if self.game_end:
+            compositor.track('win title', self.win_menu.pulsing_text_rect(alpha), self.win_menu.pulsing_text_font_size(alpha))
+        if self.show_profiler_hud:
+            compositor.track('profiler', profiler.hud_rect(self.profiler_hud_topright()), profiler.hud_lines())
+        net_text = self.net_text()
+        if net_text:
+            compositor.track('net', pygame.Rect(self.net_stats_position, text_cache.glyphs_size(None, self.net_font_size, net_text)), net_text)
+        else:
+            compositor.forget('net')
+        compositor.present(lambda: self.draw_scene(alpha))
 
     def run(self):
         running = True
+        clock = pygame.time.Clock()
+        fixed_dt = 1.0 / self.update_rate
+        accumulator = 0.0
+        if self.recorder is not None:
+            self.recorder.start_clock()  # a replay starts posting when run() starts
         while running:
-            if self.is_mute:
-                if(not self.sound_paused):
-                    pygame.mixer.pause()
-                    self.sound_paused = True
+            events = None
+            if self.event_driven and not self.is_animating():
+                events = self.wait_for_events()
+                # time spent asleep is not animation time
+                clock.tick()
+                accumulator = 0.0
             else:
-                if self.sound_paused:
-                    pygame.mixer.unpause()
-                    self.sound_paused = False
-                    
-            self.screen.fill(self.background_color)
-            self.draw_backgrounds()
-            self.draw_board()
+                accumulator += min(clock.tick(self.target_fps) / 1000.0, self.max_frame_time)
+            # waiting for events and for the frame cap is not counted as frame time
+            profiler.begin_frame()
             if self.in_main_menu:
-                self.main_menu.draw(self.screen, False)
+                self.update_voice_button()
                 self.start_ticks = pygame.time.get_ticks()
-                self.start_sound.play()
-                self.Mute_button.draw(self.screen)
+                audio.play_music(self.menu_music)
             else:
-                self.start_sound.stop()
-            if self.game_end:
-                self.win_menu.draw(self.screen, True)
+                audio.stop_music()
 
             # handle Voice control feature
-            if self.voice_control_mode and len(self.selected) < 2 and not self.waiting_to_hide:
-                if not self.stream_start:
-                    rec, stream = self.voice_control_start()
-                self.voice_control_read(stream, rec)
-            running = self.check_events()
+            if self.voice_control_mode:
+                profiler.start('voice_control_read')
+                self.voice_control_read()
+                profiler.stop('voice_control_read')
+            profiler.start('check_events')
+            running = self.check_events(events)
+            profiler.stop('check_events')
             self.check_win_condition()
-            if self.waiting_to_hide:
-                self.hide_non_matches()
-            if self.waiting_to_hide_help:
-                self.hide_non_matches_help()
-            if not self.in_main_menu:
-                if self.time_attack_mode:
-                    self.display_time_attack_timer()
-                else:
-                    self.display_timer()
-            pygame.display.flip()
+            self.update_time_attack()
+
+            profiler.start('update')
+            while accumulator >= fixed_dt:
+                self.update(fixed_dt)
+                accumulator -= fixed_dt
+            profiler.stop('update')
+            profiler.start('render')
+            self.render(accumulator / fixed_dt)
+            profiler.stop('render')
+            profiler.end_frame()
+            if 'first_frame' not in self.startup_marks:
+                self.mark_startup('first_frame')
+                # only start loading speech once the menu is visible
+                if not self.replaying:
+                    self.model_loader.start()
+                # with MEMORYGAME_STARTUP_LOG, load time and size of every asset and face are listed once the deal is decoded
+                report = self.print_asset_report if os.environ.get('MEMORYGAME_STARTUP_LOG') else None
+                self.textures.preload(self.deck, self.card_faces, report)
+        self.voice_control_stop()
+        self.computer_stop()
+        if self.profile:
+            self.dump_profile()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.net is not None:
+            self.net.close()
+        self.finish_run(False)
+        self.stats.close()
         pygame.quit()
 
 if __name__ == "__main__":
-    game = MemoryGame()
+    parser = argparse.ArgumentParser(description='IDF memory game')
+    parser.add_argument('--host', type=int, metavar='PORT', help='play "2 Players" against a machine that joins on PORT')
+    parser.add_argument('--join', metavar='HOST:PORT', help='join a hosted game as player 2')
+    parser.add_argument('--seed', type=int, help='seed for the deals, for reproducible sessions')
+    parser.add_argument('--deck', help='card deck: a name from decks/, or a directory or zip of images')
+    args = parser.parse_args()
+    game = MemoryGame(seed=args.seed, deck=args.deck)
+    if args.host is not None:
+        game.host(args.host)
+    elif args.join:
+        address, port = args.join.rsplit(':', 1)
+        game.join(address, int(port))
     game.run()
\ No newline at end of file
@@ -0,0 +1,337 @@
+from ai import ComputerPlayer
+from collections import deque
+from engine import MATCH, MISMATCH, MemoryEngine
+import argparse
+import asyncio
+import queue
+import random
+import struct
+import threading
+import time
+
+
+# Two-machine "2 Players": the host's engine is authoritative and the client mirrors it from small
+# binary deltas. Each message is a type byte followed by a fixed-size struct, so there is no framing
+# beyond the type. asyncio runs on its own thread, the game sends without waiting and drains
+# received messages once per frame.
+
+DISCONNECTED = 0  # queued locally when the connection closes, never sent
+DEAL, FLIP, MATCHED, MISMATCHED, TURN, HIDE, HELP_PAIR, HIDE_HELP, TIMER, SELECT, HELP_REQUEST, PING, PONG = range(1, 14)
+MESSAGES = {
+    # host -> client
+    DEAL: struct.Struct('<BBBB?H'),  # columns, rows, faces, players, time attack, time limit
+    FLIP: struct.Struct('<HB'),  # tile, card
+    MATCHED: struct.Struct('<HHB'),  # the pair, the player who scored
+    MISMATCHED: struct.Struct(''),  # the two selected tiles stay up until HIDE
+    TURN: struct.Struct('<B'),  # player to move
+    HIDE: struct.Struct(''),
+    HELP_PAIR: struct.Struct('<HBHB'),  # tile, card, tile, card
+    HIDE_HELP: struct.Struct(''),
+    TIMER: struct.Struct('<I'),  # ms since the deal
+    # client -> host
+    SELECT: struct.Struct('<H'),
+    HELP_REQUEST: struct.Struct(''),
+    # both ways, answered on the network thread so the round trip doesn't include a frame
+    PING: struct.Struct('<d'),
+    PONG: struct.Struct('<d'),
+}
+REMOTE_PLAYER = 1  # the client is the second player, the host moves first
+
+
+def select_messages(engine, i, result, first):
+    # the deltas for engine.select(i) having returned result, first is the tile selected before it
+    messages = [(FLIP, i, engine.deck[i])]
+    if result == MATCH:
+        messages.append((MATCHED, first, i, engine.current_player))
+    elif result == MISMATCH:
+        messages += [(MISMATCHED,), (TURN, engine.current_player)]
+    return messages
+
+
+class MirrorEngine(MemoryEngine):
+    # the client's copy of the host's board: cards are unknown until the host turns them over
+    def shuffle(self):
+        self.deck = [None] * self.tiles
+        self.positions = {}
+        self.unmatched = {}
+
+    def remaining_pairs(self):
+        return {}
+
+    def apply(self, kind, values):
+        if kind == FLIP:
+            i, card = values
+            self.deck[i] = card
+            self.selected.append(i)
+            self.selected_mask |= 1 << i
+        elif kind == MATCHED:
+            first, second, player = values
+            self.matched |= 1 << first | 1 << second
+            self.scores[player] += 1
+            self.moves += 1
+            self.selected = []
+            self.selected_mask = 0
+        elif kind == MISMATCHED:
+            self.moves += 1
+            self.mismatches += 1
+            self.pending_hide = True
+        elif kind == TURN:
+            self.current_player = values[0]
+        elif kind == HIDE:
+            self.hide_mismatch()
+        elif kind == HELP_PAIR:
+            first, first_card, second, second_card = values
+            self.deck[first] = first_card
+            self.deck[second] = second_card
+            self.help_mask = 1 << first | 1 << second
+            self.help_uses += 1
+        elif kind == HIDE_HELP:
+            self.hide_help()
+
+
+class NetSession:
+    # one connection, served by an asyncio loop on a background thread
+    def __init__(self, notify=None, ping_interval=1.0):
+        self.notify = notify  # called from the network thread after a message is queued
+        self.ping_interval = ping_interval
+        self.messages = queue.Queue()  # (type, values) for the game
+        self.writer = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.rtts = deque(maxlen=20)  # seconds, most recent round trips
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="netplay", daemon=True)
+        self._thread.start()
+
+    def is_connected(self):
+        return self.writer is not None
+
+    def send(self, kind, *values):
+        # safe from any thread, never blocks
+        self.loop.call_soon_threadsafe(self._send, kind, *values)
+
+    def _send(self, kind, *values):
+        if self.writer is None or self.writer.is_closing():
+            return
+        data = bytes([kind]) + MESSAGES[kind].pack(*values)
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+        self.messages_sent += 1
+
+    def get_messages(self):
+        # non-blocking drain, safe to call every frame
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def on_connect(self):
+        pass
+
+    def on_message(self, kind, values):
+        # network thread; the default hands the message to the game
+        self.messages.put((kind, values))
+        if self.notify is not None:
+            self.notify()
+
+    async def _serve(self, reader, writer):
+        if self.writer is not None:
+            writer.close()  # one opponent at a time
+            return
+        self.writer = writer
+        self.on_connect()
+        pinger = self.loop.create_task(self._ping())
+        try:
+            while True:
+                kind = (await reader.readexactly(1))[0]
+                message = MESSAGES[kind]
+                values = message.unpack(await reader.readexactly(message.size))
+                self.bytes_received += 1 + message.size
+                self.messages_received += 1
+                if kind == PING:
+                    self._send(PONG, *values)
+                elif kind == PONG:
+                    self.rtts.append(time.perf_counter() - values[0])
+                else:
+                    self.on_message(kind, values)
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError):
+            pass
+        finally:
+            pinger.cancel()
+            writer.close()
+            self.writer = None
+            self.on_message(DISCONNECTED, ())
+
+    async def _ping(self):
+        while True:
+            self._send(PING, time.perf_counter())
+            await asyncio.sleep(self.ping_interval)
+
+    def stats(self):
+        rtt = sum(self.rtts) / len(self.rtts) * 1000 if self.rtts else None
+        return {'connected': self.is_connected(), 'rtt_ms': rtt, 'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received, 'messages_sent': self.messages_sent,
+                'messages_received': self.messages_received}
+
+    def stats_text(self):
+        stats = self.stats()
+        if not stats['connected']:
+            return 'net: not connected'
+        rtt = f'{stats["rtt_ms"]:.1f} ms' if stats['rtt_ms'] is not None else '-'
+        return f'net: rtt {rtt}  out {stats["bytes_sent"]} B  in {stats["bytes_received"]} B'
+
+    def close(self):
+        async def shutdown():
+            if self.writer is not None:
+                self.writer.close()
+            server = getattr(self, 'server', None)
+            if server is not None:
+                server.close()
+            # the connection's task sees the close and ends, so its transport is closed before the loop stops
+            tasks = asyncio.all_tasks() - {asyncio.current_task()}
+            if tasks:
+                _, pending = await asyncio.wait(tasks, timeout=0.5)
+                for task in pending:
+                    task.cancel()
+
+        if self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(1)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(1)
+        if not self.loop.is_running() and not self.loop.is_closed():
+            self.loop.close()
+
+
+class NetServer(NetSession):
+    def start(self, host='0.0.0.0', port=0):
+        # port 0 picks a free one, see self.port
+        self.server = asyncio.run_coroutine_threadsafe(asyncio.start_server(self._serve, host, port), self.loop).result()
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+
+class NetClient(NetSession):
+    def connect(self, host, port, timeout=5.0):
+        async def open_connection():
+            reader, writer = await asyncio.open_connection(host, port)
+            self.loop.create_task(self._serve(reader, writer))
+
+        asyncio.run_coroutine_threadsafe(open_connection(), self.loop).result(timeout)
+
+
+class LoopbackHost(NetServer):
+    # stand-in for a host game in tests: deals when a client connects, enforces the rules on the
+    # network thread and plays the host's side with the computer player
+    def __init__(self, grid_size=(4, 4), faces=8, seed=0, hide_delay=0.5, help_hide_delay=0.9, think_delay=0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.grid_size = grid_size
+        self.faces = faces
+        self.seed = seed
+        self.hide_delay = hide_delay
+        self.help_hide_delay = help_hide_delay
+        self.think_delay = think_delay
+        self.engine = None
+
+    def on_connect(self):
+        columns, rows = self.grid_size
+        self.engine = MemoryEngine(columns * rows, self.faces, 2, seed=self.seed)
+        self.computer = ComputerPlayer(self.engine.tiles, 'hard', self.seed)
+        self._send(DEAL, columns, rows, self.faces, 2, False, self.engine.time_limit)
+        self._send(TURN, self.engine.current_player)
+        self._schedule()
+
+    def on_message(self, kind, values):
+        if kind == SELECT and self.engine.current_player == REMOTE_PLAYER:
+            self._select(values[0])
+        elif kind == HELP_REQUEST:
+            pair = self.engine.help_pair()
+            if pair is not None:
+                self._send(HELP_PAIR, pair[0], self.engine.deck[pair[0]], pair[1], self.engine.deck[pair[1]])
+                self.loop.call_later(self.help_hide_delay, self._hide_help)
+
+    def _select(self, i):
+        engine = self.engine
+        first = engine.selected[0] if engine.selected else None
+        result = engine.select(i)
+        if result is None:
+            return
+        self.computer.observe(i, engine.deck[i])
+        if result == MATCH:
+            self.computer.remove(first)
+            self.computer.remove(i)
+        for message in select_messages(engine, i, result, first):
+            self._send(*message)
+        if result == MISMATCH:
+            self.loop.call_later(self.hide_delay, self._hide)
+        else:
+            self._schedule()
+
+    def _hide(self):
+        self.engine.hide_mismatch()
+        self._send(HIDE)
+        self._schedule()
+
+    def _hide_help(self):
+        self.engine.hide_help()
+        self._send(HIDE_HELP)
+
+    def _schedule(self):
+        engine = self.engine
+        if engine.current_player != REMOTE_PLAYER and not engine.pending_hide and not engine.is_won():
+            self.loop.call_later(self.think_delay, self._computer_move)
+
+    def _computer_move(self):
+        engine = self.engine
+        self._select(self.computer.choose(engine.selected[0] if engine.selected else None))
+
+
+def play_loopback(grid_size=(4, 4), seed=0, timeout=30.0):
+    # a random client against LoopbackHost over 127.0.0.1, returns the client's and the host's boards
+    # and both sessions' stats
+    host = LoopbackHost(grid_size, seed=seed, ping_interval=0.1)
+    host.start('127.0.0.1', 0)
+    client = NetClient(ping_interval=0.1)
+    client.connect('127.0.0.1', host.port)
+    rng = random.Random(seed)
+    engine = None
+    waiting = False  # a SELECT is on its way
+    deadline = time.perf_counter() + timeout
+    while not (engine is not None and engine.is_won()) and time.perf_counter() < deadline:
+        for kind, values in client.get_messages():
+            if kind == DEAL:
+                columns, rows, faces, players = values[:4]
+                engine = MirrorEngine(columns * rows, faces, players)
+            elif engine is not None:
+                engine.apply(kind, values)
+                waiting = waiting and kind != FLIP
+        if (engine is not None and not waiting and engine.current_player == REMOTE_PLAYER
+                and not engine.pending_hide and len(engine.selected) < 2):
+            client.send(SELECT, rng.choice([i for i in range(engine.tiles) if engine.can_select(i)]))
+            waiting = True
+        time.sleep(0.001)
+    time.sleep(0.2)  # let a last ping come back
+    stats = host.stats(), client.stats()
+    client.close()
+    host.close()
+    return engine, host.engine, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play a random client against the loopback host and print traffic')
+    parser.add_argument('--grid', default='4x4')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    grid_size = tuple(int(n) for n in args.grid.split('x'))
+    start = time.perf_counter()
+    engine, _, (host_stats, client_stats) = play_loopback(grid_size, args.seed)
+    print(f'won {engine.is_won()} moves {engine.moves} scores {engine.scores} in {time.perf_counter() - start:.2f}s')
+    print(f'host:   {host_stats}')
+    print(f'client: {client_stats}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+from collections import deque
+from text_cache import text_cache
+import json
+import time
+import pygame
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class FrameProfiler:
+    # times named phases of each frame; while disabled start and stop return straight away
+    def __init__(self, history=600, max_trace_events=200000, hud_refresh=0.5):
+        self.enabled = False
+        self.history = history  # frames kept for the rolling statistics
+        self.frames = deque(maxlen=history)  # seconds of work per frame
+        self.intervals = deque(maxlen=history)  # seconds from one frame to the next, for FPS
+        self.phases = {}  # name -> deque of seconds
+        self.trace = deque(maxlen=max_trace_events)  # (name, start, seconds) for the Chrome trace
+        self.hud_refresh = hud_refresh  # seconds between HUD text updates so it stays readable
+        self.hud_font_size = 20
+        self._hud_lines = ()
+        self._hud_time = 0.0
+        self._starts = {}
+        self._frame_start = None
+        self._origin = time.perf_counter()
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self._frame_start = None
+        self._starts.clear()
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            self.intervals.append(now - self._frame_start)
+        self._frame_start = now
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        seconds = time.perf_counter() - self._frame_start
+        self.frames.append(seconds)
+        self.trace.append(('frame', self._frame_start, seconds))
+
+    def start(self, name):
+        if self.enabled:
+            self._starts[name] = time.perf_counter()
+
+    def stop(self, name):
+        if not self.enabled:
+            return
+        start = self._starts.pop(name, None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        samples = self.phases.get(name)
+        if samples is None:
+            samples = self.phases[name] = deque(maxlen=self.history)
+        samples.append(seconds)
+        self.trace.append((name, start, seconds))
+
+    def stats(self):
+        # milliseconds over the rolling window
+        interval = sum(self.intervals) / len(self.intervals) if self.intervals else 0.0
+        return {
+            'fps': 1 / interval if interval else 0.0,
+            'p50': percentile(self.frames, 50) * 1000,
+            'p99': percentile(self.frames, 99) * 1000,
+            'phases': {name: sum(samples) / len(samples) * 1000 for name, samples in self.phases.items() if samples},
+        }
+
+    def hud_lines(self):
+        now = time.perf_counter()
+        if now - self._hud_time >= self.hud_refresh:
+            stats = self.stats()
+            lines = [f'FPS {stats["fps"]:.0f}', f'frame p50 {stats["p50"]:.2f} p99 {stats["p99"]:.2f} ms']
+            lines += [f'{name} {ms:.2f} ms' for name, ms in sorted(stats['phases'].items(), key=lambda item: -item[1])]
+            self._hud_lines = tuple(lines)
+            self._hud_time = now
+        return self._hud_lines
+
+    def hud_rect(self, topright):
+        lines = self.hud_lines()
+        width = max(text_cache.glyphs_size(None, self.hud_font_size, line)[0] for line in lines)
+        height = text_cache.font(None, self.hud_font_size).get_height() * len(lines)
+        rect = pygame.Rect(0, 0, width + 10, height + 10)
+        rect.topright = topright
+        return rect
+
+    def draw_hud(self, screen, topright):
+        rect = self.hud_rect(topright)
+        screen.fill((0, 0, 0), rect)
+        y = rect.y + 5
+        for line in self.hud_lines():
+            # numbers change every refresh, so lines are built from cached glyphs
+            y = text_cache.draw_glyphs(screen, (rect.x + 5, y), None, self.hud_font_size, line, (255, 255, 0)).bottom
+        return rect
+
+    def dump_trace(self, path):
+        # Chrome trace format, open in chrome://tracing or ui.perfetto.dev
+        events = [{'name': name, 'ph': 'X', 'ts': (start - self._origin) * 1e6, 'dur': seconds * 1e6, 'pid': 0, 'tid': 0}
+                  for name, start, seconds in self.trace]
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+        return len(events)
+
+
+# shared by the game loop and the compositor
+profiler = FrameProfiler()
@@ -0,0 +1,204 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import pygame
+from memorygame import MemoryGame
+
+
+# Frame time and allocations of each screen as the board grows, rendered headlessly and compared
+# against a stored baseline. The Vosk model is only loaded by MemoryGame.run(), which is never called here.
+# Every frame is a full redraw so the numbers don't depend on what changed since the last frame.
+# Frame times are compared as multiples of a fixed calibration workload timed right next to them in
+# the same process, so a baseline stored on one machine still holds on another and a busy machine
+# slows both sides alike.
+
+BASELINE_PATH = 'render_baseline.json'
+
+
+def measure(frames, step):
+    start = time.perf_counter()
+    for _ in range(frames):
+        step()
+    return (time.perf_counter() - start) / frames
+
+
+def measure_allocations(frames, step):
+    # (peak KiB allocated while drawing a frame, bytes still held per frame afterwards)
+    tracemalloc.start()
+    held = tracemalloc.get_traced_memory()[0]
+    peaks = []
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        step()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    growth = tracemalloc.get_traced_memory()[0] - held
+    tracemalloc.stop()
+    return statistics.median(peaks) / 1024, growth / frames
+
+
+def calibration():
+    # a fixed mix of blits and small calls into pygame from Python, about what a frame does
+    surface = pygame.Surface((700, 500))
+    tile = pygame.Surface((100, 100))
+    tile.fill((200, 60, 60))
+    rects = [pygame.Rect(k * 20, 0, 18, 18) for k in range(30)]
+
+    def step():
+        surface.fill((255, 255, 255))
+        for k in range(64):
+            surface.blit(tile, (k * 37 % 600, k * 53 % 400))
+        for k in range(1500):
+            rects[k % 30].collidepoint((k % 600, k % 20))
+
+    step()
+    return step
+
+
+def scenarios(game):
+    # (name, setup, step) for each screen; setup puts the game into that state, step draws one frame
+    full = game.screen.get_rect()
+    dt = 1 / game.update_rate
+
+    def reset(in_main_menu=False, game_end=False, time_attack=False):
+        game.compositor.full_redraw = True
+        game.engine.rng.seed(0)
+        game.engine.new_game(1)
+        game.in_main_menu = in_main_menu
+        game.game_end = game_end
+        game.time_attack_mode = time_attack
+        game.engine.time_attack = time_attack
+        game.flip_progress = [0.0] * len(game.rects)
+        game.start_game_clock()
+
+    def menu():
+        game.update(dt)
+        game.render(1.0)
+
+    def at_rest():
+        game.update(dt)
+        game.render(1.0)
+
+    def flipping():
+        # every tile turns over continuously
+        game.engine.help_mask = game.engine.full_mask
+        for i in range(len(game.flip_progress)):
+            game.flip_progress[i] = (game.flip_progress[i] + 0.05) % 1
+        game.render(1.0)
+
+    def win():
+        game.update(dt)
+        game.render(1.0)
+
+    def timer():
+        # a new number every frame, as if each frame were a second later
+        game.start_ticks -= 1000
+        game.render(1.0)
+
+    points = [(x, y) for x in range(0, full.width, 7) for y in range(0, full.height, 11)]
+
+    def click():
+        for point in points:
+            game.tile_at(point)
+
+    return [
+        ('menu', lambda: reset(in_main_menu=True), menu),
+        ('at rest', reset, at_rest),
+        ('all flipping', reset, flipping),
+        ('win overlay', lambda: reset(game_end=True), win),
+        ('time attack timer', lambda: reset(time_attack=True), timer),
+        (f'{len(points)} hit tests', reset, click),
+    ]
+
+
+def run(sizes, frames, repeats):
+    # size -> scenario -> {'ms', 'relative', 'fps', 'peak_kib', 'held_bytes'}, relative is ms in calibration units
+    results = {}
+    for size in sizes:
+        columns, rows = (int(n) for n in size.split('x'))
+        game = MemoryGame(grid_size=(columns, rows))
+        calibrate = calibration()
+        results[size] = {}
+        for name, setup, step in scenarios(game):
+            setup()
+            step()  # warm up the caches
+            times = []
+            ratios = []
+            for _ in range(repeats):
+                # the calibration is timed right before each run, under the same load
+                unit = measure(frames // 4, calibrate)
+                seconds = measure(frames, step)
+                times.append(seconds)
+                ratios.append(seconds / unit)
+            seconds = statistics.median(times)
+            peak_kib, held_bytes = measure_allocations(frames, step)
+            results[size][name] = {'ms': seconds * 1000, 'relative': statistics.median(ratios), 'fps': 1 / seconds,
+                                   'peak_kib': peak_kib, 'held_bytes': held_bytes}
+    pygame.quit()
+    return results
+
+
+def compare(results, baseline, threshold, alloc_threshold):
+    # returns the regressions as lines of text
+    regressions = []
+    for size, scenario_results in results.items():
+        for name, result in scenario_results.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if 'relative' in base and result['relative'] > base['relative'] * (1 + threshold):
+                regressions.append(f'{size} {name}: {result["relative"]:.2f}x calibration ({result["ms"]:.3f} ms), '
+                                   f'baseline {base["relative"]:.2f}x')
+            if result['peak_kib'] > base['peak_kib'] * (1 + alloc_threshold) + 1:
+                regressions.append(f'{size} {name}: {result["peak_kib"]:.1f} KiB/frame, baseline {base["peak_kib"]:.1f} KiB/frame')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rendering for growing grid sizes against a stored baseline')
+    parser.add_argument('--sizes', default='4x4,6x6,8x8,12x12,16x16')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=7, help='the median of this many runs is kept')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.5, help='allowed slowdown relative to the calibration, 0.5 is 50%%')
+    parser.add_argument('--alloc-threshold', type=float, default=0.5, help='allowed growth of allocations per frame')
+    args = parser.parse_args()
+
+    results = run(args.sizes.split(','), args.frames, args.repeats)
+    assert 'vosk' not in sys.modules, 'the benchmark must not load the speech model'
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    for size, scenario_results in results.items():
+        columns = []
+        for name, result in scenario_results.items():
+            base = baseline.get(size, {}).get(name)
+            change = f' ({result["relative"] / base["relative"] - 1:+.0%})' if base and 'relative' in base else ''
+            columns.append(f'{name}: {result["ms"]:.3f} ms{change} {result["peak_kib"]:.1f} KiB')
+        print(f'{size:>7}  ' + '  '.join(columns))
+
+    if args.update_baseline:
+        for size, scenario_results in results.items():
+            baseline.setdefault(size, {}).update(scenario_results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f'baseline written to {args.baseline}')
+        return 0
+    regressions = compare(results, baseline, args.threshold, args.alloc_threshold)
+    for line in regressions:
+        print(f'REGRESSION {line}')
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
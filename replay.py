@@ -0,0 +1,277 @@
+from engine import MISMATCH, MemoryEngine
+from voice_control import VOICE_COMMANDS
+import argparse
+import glob
+import struct
+import threading
+import time
+
+
+# Session logs: a header with the game's seed, then one timestamped record per input.
+# Every deal takes its seed from the game's generator and is logged as a GAME_START record, so the
+# rules can be replayed on the engine alone, without pygame, thousands of sessions at a time.
+
+MAGIC = b'MGRP'
+VERSION = 2  # 2 added LAYOUT records, version 1 logs still read
+HEADER = struct.Struct('<4sHQBB')  # magic, version, game seed, columns, rows
+RECORD = struct.Struct('<BI')  # record type, milliseconds since recording started
+
+GAME_START, MOUSE, KEY, VOICE, COMPUTER, QUIT, LAYOUT = range(1, 8)
+PAYLOADS = {
+    # deal seed, columns, rows, faces, players, time attack, vs computer, time limit, hide delay,
+    # board area, help and reset buttons as x, y, width, height
+    GAME_START: struct.Struct('<QBBBB??HH4h4h4h'),
+    MOUSE: struct.Struct('<hhB'),  # x, y, button
+    KEY: struct.Struct('<i'),
+    VOICE: struct.Struct('<h'),  # tile number, or -1 - index into VOICE_COMMANDS
+    COMPUTER: struct.Struct('<H'),  # tile flipped by the computer player
+    QUIT: struct.Struct(''),
+    # the window was resized: its width and height, then board area, help and reset buttons as in GAME_START
+    LAYOUT: struct.Struct('<HH4h4h4h'),
+}
+
+
+class Recorder:
+    def __init__(self, path, seed, grid_size):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, *grid_size))
+        self.start_clock()
+
+    def start_clock(self):
+        self.start = time.perf_counter()
+
+    def _write(self, kind, *values):
+        ms = int((time.perf_counter() - self.start) * 1000)
+        self.file.write(RECORD.pack(kind, ms) + PAYLOADS[kind].pack(*values))
+
+    def game_start(self, seed, grid_size, faces, players, time_attack, computer, time_limit, hide_delay, board_area, help_rect,
+                   reset_rect):
+        self._write(GAME_START, seed, *grid_size, faces, players, time_attack, computer, time_limit, hide_delay,
+                    *board_area, *help_rect, *reset_rect)
+
+    def layout(self, size, board_area, help_rect, reset_rect):
+        self._write(LAYOUT, *size, *board_area, *help_rect, *reset_rect)
+
+    def mouse(self, pos, button):
+        self._write(MOUSE, pos[0], pos[1], button)
+
+    def key(self, key):
+        self._write(KEY, key)
+
+    def voice(self, command):
+        self._write(VOICE, command if isinstance(command, int) else -1 - VOICE_COMMANDS.index(command))
+
+    def computer(self, tile):
+        self._write(COMPUTER, tile)
+
+    def quit(self):
+        self._write(QUIT)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def read_log(path):
+    # (seed, (columns, rows)), [(record type, ms, values)]
+    with open(path, 'rb') as file:
+        data = file.read()
+    magic, version, seed, columns, rows = HEADER.unpack_from(data)
+    if magic != MAGIC or not 1 <= version <= VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} session log')
+    records = []
+    offset = HEADER.size
+    while offset < len(data):
+        kind, ms = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        payload = PAYLOADS[kind]
+        records.append((kind, ms, payload.unpack_from(data, offset)))
+        offset += payload.size
+    return (seed, (columns, rows)), records
+
+
+def voice_command(value):
+    return value if value >= 0 else VOICE_COMMANDS[-1 - value]
+
+
+def tile_at(board_area, grid_size, pos):
+    # the same arithmetic as MemoryGame.tile_at
+    bx, by, width, height = board_area
+    columns, rows = grid_size
+    rect_width, rect_height = width // columns, height // rows
+    gap = min(20, rect_width // 5, rect_height // 5)
+    column, x = divmod(pos[0] - bx, rect_width)
+    row, y = divmod(pos[1] - by, rect_height)
+    if 0 <= column < columns and 0 <= row < rows and x < rect_width - gap and y < rect_height - gap:
+        return column * rows + row
+    return None
+
+
+def contains(rect, pos):
+    x, y, width, height = rect
+    return x <= pos[0] < x + width and y <= pos[1] < y + height
+
+
+class HeadlessGame:
+    # one deal played back on the engine with the game's timings
+    def __init__(self, start_ms, values):
+        seed, columns, rows, faces, players, time_attack, computer, time_limit, hide_delay = values[:9]
+        self.grid_size = (columns, rows)
+        self.board_area = values[9:13]
+        self.help_rect = values[13:17]
+        self.reset_rect = values[17:21]
+        self.computer = computer
+        self.hide_delay = hide_delay
+        self.engine = MemoryEngine(columns * rows, faces, players)
+        self.engine.rng.seed(seed)
+        self.engine.new_game(players)
+        if time_attack:
+            self.engine.start_time_attack(time_limit)
+        self.start_ms = start_ms
+        self.mismatch_ms = None
+        self.help_used = False
+        self.timed_out = False
+        self.abandoned = False  # reset back to the menu
+
+    def layout(self, values):
+        self.board_area = values[2:6]
+        self.help_rect = values[6:10]
+        self.reset_rect = values[10:14]
+
+    def advance(self, ms):
+        # what the game's timers would have done by now
+        if self.mismatch_ms is not None and ms >= self.mismatch_ms + self.hide_delay:
+            self.engine.hide_mismatch()
+            self.mismatch_ms = None
+        if self.engine.time_attack and not self.engine.is_won() and ms - self.start_ms >= self.engine.time_limit * 1000:
+            self.timed_out = True
+
+    def is_over(self):
+        return self.timed_out or self.abandoned or self.engine.is_won()
+
+    def select(self, ms, i, by_computer=False):
+        if self.is_over() or (self.computer and (self.engine.current_player == 1) != by_computer):
+            return
+        if self.engine.select(i) == MISMATCH:
+            self.mismatch_ms = ms
+
+    def help(self):
+        if not self.is_over() and not self.help_used:
+            self.help_used = True
+            self.engine.help_pair()
+
+    def click(self, ms, pos):
+        if self.is_over():
+            return
+        if contains(self.help_rect, pos):
+            self.help()
+            return
+        if contains(self.reset_rect, pos):
+            self.abandoned = True
+            return
+        i = tile_at(self.board_area, self.grid_size, pos)
+        if i is not None:
+            self.select(ms, i)
+
+    def summary(self):
+        engine = self.engine
+        return {'won': engine.is_won(), 'timed_out': self.timed_out, 'abandoned': self.abandoned, 'moves': engine.moves,
+                'mismatches': engine.mismatches, 'scores': list(engine.scores), 'help_uses': engine.help_uses}
+
+
+def replay_headless(path):
+    # plays a session back on the engine as fast as possible, returns one summary per deal
+    _, records = read_log(path)
+    games = []
+    game = None
+    for kind, ms, values in records:
+        if game is not None:
+            game.advance(ms)
+        if kind == GAME_START:
+            game = HeadlessGame(ms, values)
+            games.append(game)
+        elif game is None:
+            continue
+        elif kind == MOUSE:
+            game.click(ms, values[:2])
+        elif kind == VOICE:
+            command = voice_command(values[0])
+            if command == 'help':
+                game.help()
+            elif command == 'reset':
+                game.abandoned = True
+            elif isinstance(command, int) and 1 <= command <= game.engine.tiles:
+                game.select(ms, command - 1)
+        elif kind == COMPUTER:
+            game.select(ms, values[0], by_computer=True)
+        elif kind == LAYOUT:
+            game.layout(values)
+    return [game.summary() for game in games]
+
+
+def replay_realtime(path, speed=1.0):
+    # feeds the log through a real game, with rendering, at the pace it was recorded
+    import pygame
+    from memorygame import MemoryGame, VOICE_COMMAND_EVENT
+    (seed, grid_size), records = read_log(path)
+    game = MemoryGame(grid_size=grid_size, seed=seed)
+    game.replaying = True
+
+    def post():
+        start = time.perf_counter()
+        for kind, ms, values in records:
+            delay = ms / 1000 / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            # deals and the computer's moves follow from the seed, only inputs are posted
+            if kind == MOUSE:
+                event = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=values[:2], button=values[2], replayed=True)
+            elif kind == LAYOUT:
+                # replayed windowed at the recorded size, F11 itself is not replayed
+                event = pygame.event.Event(pygame.VIDEORESIZE, size=values[:2], w=values[0], h=values[1], replayed=True)
+            elif kind == KEY and values[0] == pygame.K_F11:
+                continue
+            elif kind == KEY:
+                event = pygame.event.Event(pygame.KEYDOWN, key=values[0], replayed=True)
+            elif kind == VOICE:
+                event = pygame.event.Event(VOICE_COMMAND_EVENT, command=voice_command(values[0]), replayed=True)
+            elif kind == QUIT:
+                event = pygame.event.Event(pygame.QUIT, replayed=True)
+            else:
+                continue
+            pygame.event.post(event)
+        if not records or records[-1][0] != QUIT:
+            # a log cut short by a crash or Ctrl+C has no QUIT record, the replay ends a moment after its last input
+            time.sleep(1.0 / speed)
+            pygame.event.post(pygame.event.Event(pygame.QUIT, replayed=True))
+
+    threading.Thread(target=post, name="replay", daemon=True).start()
+    game.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded sessions (record one with MEMORYGAME_RECORD=path)')
+    parser.add_argument('logs', nargs='+', help='session logs, glob patterns are expanded')
+    parser.add_argument('--headless', action='store_true', help='replay on the engine only, as fast as possible')
+    parser.add_argument('--speed', type=float, default=1.0, help='realtime replay speed factor')
+    args = parser.parse_args()
+    paths = [path for pattern in args.logs for path in sorted(glob.glob(pattern)) or [pattern]]
+
+    if not args.headless:
+        for path in paths:
+            replay_realtime(path, args.speed)
+        return
+    start = time.perf_counter()
+    deals = moves = 0
+    for path in paths:
+        for summary in replay_headless(path):
+            deals += 1
+            moves += summary['moves']
+            print(f'{path}: ' + ' '.join(f'{key}={value}' for key, value in summary.items()))
+    seconds = time.perf_counter() - start
+    print(f'{len(paths)} sessions, {deals} deals, {moves} moves in {seconds:.2f}s')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import time
+import numpy as np
+
+
+# Monte Carlo play of the game rules for tuning Time Attack limits and the help button.
+# Whole batches of boards advance together as NumPy arrays; batches are spread over processes.
+# Boards are dealt like engine.MemoryEngine: pair k shows face k % faces.
+
+PLAYER_MODELS = ('random', 'perfect', 'bounded')
+MODES = ('1p', '2p', 'time-attack')
+
+
+def deal(rng, games, tiles, faces):
+    base = np.arange(tiles // 2) % faces
+    return rng.permuted(np.tile(np.concatenate([base, base]), (games, 1)), axis=1)
+
+
+def pick(rng, mask):
+    # one random True column per row (rows without any return column 0)
+    scores = np.where(mask, rng.random(mask.shape), -1.0)
+    return scores.argmax(axis=1)
+
+
+class Batch:
+    def __init__(self, rng, games, tiles, faces, players, model, capacity, forget):
+        self.rng = rng
+        self.rows = np.arange(games)
+        self.deck = deal(rng, games, tiles, faces)
+        self.faces = faces
+        self.model = model
+        self.capacity = capacity if model == 'bounded' else tiles
+        self.forget = forget if model == 'bounded' else 0.0
+        self.matched = np.zeros((games, tiles), bool)
+        # what each player remembers, and when they saw it
+        self.known = np.zeros((players, games, tiles), bool)
+        self.seen_at = np.zeros((players, games, tiles), np.int64)
+        self.current = np.zeros(games, np.int64)
+        self.scores = np.zeros((players, games), np.int64)
+        self.moves = np.zeros(games, np.int64)
+        self.mismatches = np.zeros(games, np.int64)
+        self.step = 0
+
+    def remember(self, tiles, active):
+        self.known[:, self.rows[active], tiles[active]] = True
+        self.seen_at[:, self.rows[active], tiles[active]] = self.step
+
+    def show_help(self):
+        # the help button briefly shows one hidden pair to the current player
+        hidden = ~self.matched
+        first = pick(self.rng, hidden)
+        partner = hidden & (self.deck == self.deck[self.rows, first][:, None])
+        partner[self.rows, first] = False
+        second = partner.argmax(axis=1)
+        active = hidden.any(axis=1)
+        self.known[self.current[active], self.rows[active], first[active]] = True
+        self.known[self.current[active], self.rows[active], second[active]] = True
+
+    def choose(self):
+        hidden = ~self.matched
+        if self.model == 'random':
+            first = pick(self.rng, hidden)
+            others = hidden.copy()
+            others[self.rows, first] = False
+            return first, pick(self.rng, others)
+
+        known = self.known[self.current, self.rows] & hidden
+        # a remembered pair: count remembered tiles per face
+        index = (self.rows[:, None] * self.faces + self.deck)[known]
+        counts = np.bincount(index, minlength=len(self.rows) * self.faces).reshape(len(self.rows), self.faces)
+        has_pair = (counts >= 2).any(axis=1)
+        pair_face = (counts >= 2).argmax(axis=1)
+
+        unknown = hidden & ~known
+        explore = np.where(unknown.any(axis=1)[:, None], unknown, hidden)
+        first = np.where(has_pair, (known & (self.deck == pair_face[:, None])).argmax(axis=1), pick(self.rng, explore))
+
+        face = self.deck[self.rows, first]
+        partner = known & (self.deck == face[:, None])
+        partner[self.rows, first] = False
+        unknown[self.rows, first] = False
+        others = hidden.copy()
+        others[self.rows, first] = False
+        guess = pick(self.rng, np.where(unknown.any(axis=1)[:, None], unknown, others))
+        second = np.where(partner.any(axis=1), partner.argmax(axis=1), guess)
+        return first, second
+
+    def play_turn(self):
+        active = ~self.matched.all(axis=1)
+        if not active.any():
+            return False
+        self.step += 1
+        first, second = self.choose()
+        self.remember(first, active)
+        self.remember(second, active)
+        match = active & (self.deck[self.rows, first] == self.deck[self.rows, second])
+        self.matched[self.rows[match], first[match]] = True
+        self.matched[self.rows[match], second[match]] = True
+        # matched tiles are off the board, they no longer take up anyone's memory
+        self.known[:, self.rows[match], first[match]] = False
+        self.known[:, self.rows[match], second[match]] = False
+        self.scores[self.current[match], self.rows[match]] += 1
+        miss = active & ~match
+        self.mismatches += miss
+        self.moves += active
+        self.current = np.where(miss, (self.current + 1) % self.scores.shape[0], self.current)
+        self.forget_some()
+        return True
+
+    def forget_some(self):
+        if self.forget:
+            self.known &= self.rng.random(self.known.shape) >= self.forget
+        if self.capacity < self.known.shape[2]:
+            # keep only the most recently seen tiles
+            recency = np.where(self.known, self.seen_at, -1)
+            threshold = -np.partition(-recency, self.capacity - 1, axis=2)[:, :, self.capacity - 1]
+            self.known &= recency >= np.maximum(threshold, 0)[:, :, None]
+
+
+def simulate(task):
+    # one batch of games, run in a worker process
+    seed, games, tiles, faces, players, model, capacity, forget, help_at = task
+    rng = np.random.default_rng(seed)
+    batch = Batch(rng, games, tiles, faces, players, model, capacity, forget)
+    while True:
+        if batch.step == help_at:
+            batch.show_help()
+        if not batch.play_turn():
+            break
+    return batch.moves, batch.mismatches, batch.scores
+
+
+def run_batches(args, tiles, players, seed):
+    tasks = []
+    remaining = args.games
+    while remaining > 0:
+        games = min(args.batch, remaining)
+        tasks.append((seed + len(tasks), games, tiles, args.faces, players, args.model, args.capacity, args.forget, args.help_at))
+        remaining -= games
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(simulate, tasks))
+    moves = np.concatenate([r[0] for r in results])
+    mismatches = np.concatenate([r[1] for r in results])
+    scores = np.concatenate([r[2] for r in results], axis=1)
+    # seconds to finish: thinking and clicking per move plus the pause after each mismatch
+    seconds = moves * args.move_seconds + mismatches * args.mismatch_seconds
+    return moves, seconds, scores
+
+
+def describe(name, values, unit=''):
+    p10, p50, p90, p99 = np.percentile(values, [10, 50, 90, 99])
+    return f'{name} p10 {p10:.1f}{unit} p50 {p50:.1f}{unit} p90 {p90:.1f}{unit} p99 {p99:.1f}{unit}'
+
+
+def report(args, size, tiles):
+    if args.mode == '2p':
+        moves, seconds, scores = run_batches(args, tiles, 2, args.seed)
+        print(f'{size}: ' + describe('moves', moves))
+        print(f'{size}: player 1 wins {np.mean(scores[0] > scores[1]):.1%}, '
+              f'player 2 wins {np.mean(scores[1] > scores[0]):.1%}, ties {np.mean(scores[0] == scores[1]):.1%}')
+        return
+    moves, seconds, _ = run_batches(args, tiles, 1, args.seed)
+    print(f'{size}: ' + describe('moves', moves) + '  ' + describe('time', seconds, 's'))
+    if args.mode == 'time-attack':
+        # rounds are independent boards; limit starts at the first limit and drops like restart_game
+        survived = np.ones(len(seconds), bool)
+        reached = np.zeros(len(seconds), np.int64)
+        limit = args.time_limit
+        for round_number in range(args.rounds):
+            _, round_seconds, _ = run_batches(args, tiles, 1, args.seed + 1000 * (round_number + 1))
+            survived &= round_seconds <= limit
+            reached += survived
+            limit = max(args.min_limit, limit - args.limit_step)
+        print(f'{size}: rounds won mean {reached.mean():.2f}, ' + describe('rounds', reached))
+    for rate in (50, 80, 95):
+        print(f'{size}: a limit of {np.percentile(seconds, rate):.0f}s lets {rate}% of games finish')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate batches of memory games for difficulty tuning')
+    parser.add_argument('--sizes', default='4x4,6x6,8x8')
+    parser.add_argument('--faces', type=int, default=8, help='distinct card faces in a deal')
+    parser.add_argument('--mode', choices=MODES, default='1p')
+    parser.add_argument('--model', choices=PLAYER_MODELS, default='bounded')
+    parser.add_argument('--capacity', type=int, default=8, help='tiles a bounded player remembers')
+    parser.add_argument('--forget', type=float, default=0.05, help='chance per turn to forget each remembered tile')
+    parser.add_argument('--help-at', type=int, default=-1, help='turn on which help is used, -1 for never')
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--move-seconds', type=float, default=2.0)
+    parser.add_argument('--mismatch-seconds', type=float, default=0.5)
+    parser.add_argument('--time-limit', type=float, default=60)
+    parser.add_argument('--limit-step', type=float, default=5)
+    parser.add_argument('--min-limit', type=float, default=10)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for size in args.sizes.split(','):
+        columns, rows = (int(n) for n in size.split('x'))
+        if columns * rows % 2:
+            parser.error(f'{size} has an odd number of tiles')
+        report(args, size, columns * rows)
+    print(f'{time.perf_counter() - start:.1f}s')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+# Launch time with and without the on-disk asset cache. Every launch is a fresh process that builds
+# the game, draws the first menu frame and then every face of a deal, headlessly:
+#   no cache  MEMORYGAME_ASSET_CACHE is empty, everything is decoded
+#   cold      the cache directory starts empty, everything is decoded and written
+#   cached    the cache is filled but its files were dropped from the OS page cache
+#   warm      the cache is filled and its files are in the page cache
+# Source files are dropped from the page cache before every launch except the warm ones. The seed is
+# fixed so every launch deals the same faces. Each phase is shown as the time since the previous one.
+
+MODES = ['no cache', 'cold', 'cached', 'warm']
+PHASES = ['imports', 'init', 'first_frame', 'faces']
+
+
+def drop_from_page_cache(paths):
+    # clean pages of these files are evicted, the next read comes from the disk
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for path in paths:
+        with open(path, 'rb') as file:
+            os.fdatasync(file.fileno())
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+    return True
+
+
+def child(grid):
+    # one launch, prints seconds since process start at each phase as JSON
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import time
+    import memorygame
+    from assets import assets
+    game = memorygame.MemoryGame(grid_size=grid, seed=0)
+    game.render(1.0)
+    game.mark_startup('first_frame')
+    game.deal(1)
+    game.textures.wait()
+    size = game.heatmap_rect.height - 6
+    for card in range(game.engine.faces):
+        game.card_texture(card)
+        game.card_texture(card, (size, size))
+    marks = dict(game.startup_marks, faces=time.perf_counter() - memorygame.process_start)
+    marks['disk'] = assets.disk.stats() if assets.disk is not None else None
+    print(json.dumps(marks))
+
+
+def launch(grid, environment):
+    output = subprocess.run([sys.executable, __file__, '--child', '--grid', f'{grid[0]}x{grid[1]}'], env=environment,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(grid, launches, deck=None):
+    # mode -> phase -> median ms spent in it
+    directory = tempfile.mkdtemp()
+    sources = [path for pattern in ('*.png', '*.wav', '*.mp3') for path in glob.glob(pattern) if path != 'IDF.mp3']
+    if deck and os.path.isfile(deck):
+        sources.append(deck)
+    results = {}
+    try:
+        for mode in MODES:
+            environment = dict(os.environ, MEMORYGAME_ASSET_CACHE='' if mode == 'no cache' else directory)
+            if deck:
+                environment['MEMORYGAME_DECK'] = deck
+            if mode == 'cached':
+                launch(grid, environment)  # fills the cache if cold left it empty
+            samples = []
+            for _ in range(launches):
+                if mode == 'cold':
+                    shutil.rmtree(directory)
+                    os.makedirs(directory)
+                if mode != 'warm':
+                    drop_from_page_cache(sources)
+                if mode == 'cached':
+                    drop_from_page_cache(glob.glob(os.path.join(directory, '*')))
+                samples.append(launch(grid, environment))
+            results[mode] = {phase: statistics.median(sample[phase] - (sample[PHASES[k - 1]] if k else 0) for sample in samples) * 1000
+                             for k, phase in enumerate(PHASES)}
+            results[mode]['disk'] = samples[-1]['disk']
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare launch times without, with a cold and with a filled asset cache')
+    parser.add_argument('--grid', default='4x4')
+    parser.add_argument('--launches', type=int, default=5, help='the median of this many launches is shown')
+    parser.add_argument('--deck', help='a deck directory or zip, e.g. one made with decks.make_deck')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    grid = tuple(int(n) for n in args.grid.split('x'))
+    if args.child:
+        child(grid)
+        return
+    if not hasattr(os, 'posix_fadvise'):
+        print('no posix_fadvise here, "cached" launches read from the page cache like warm ones')
+    results = run(grid, args.launches, args.deck)
+    print(f'{"":>9}  ' + '  '.join(f'{phase:>11}' for phase in PHASES) + '   asset cache')
+    for mode, result in results.items():
+        disk = result['disk']
+        cache = f'{disk["hits"]} hits {disk["misses"]} misses' if disk else '-'
+        print(f'{mode:>9}  ' + '  '.join(f'{result[phase]:8.1f} ms' for phase in PHASES) + f'   {cache}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+
+# Finished games in a local SQLite file. The game only queues rows; a writer thread inserts them
+# in batches, one transaction each, so the frame never waits on the disk. Queries the game needs
+# go through request() and are answered from that thread too.
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS games (
+        id INTEGER PRIMARY KEY,
+        played_at REAL NOT NULL,
+        player TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        columns INTEGER NOT NULL,
+        rows INTEGER NOT NULL,
+        won INTEGER NOT NULL,
+        moves INTEGER NOT NULL,
+        mismatches INTEGER NOT NULL,
+        help_uses INTEGER NOT NULL,
+        seconds REAL NOT NULL,
+        round INTEGER,
+        score INTEGER NOT NULL,
+        opponent_score INTEGER
+    )""",
+    # one index per query below, each ends in the column it sorts on
+    "CREATE INDEX IF NOT EXISTS games_fastest ON games (mode, columns, rows, won, seconds)",
+    "CREATE INDEX IF NOT EXISTS games_rounds ON games (mode, columns, rows, round DESC, seconds)",
+    "CREATE INDEX IF NOT EXISTS games_player ON games (player, mode, columns, rows, won, seconds)",
+]
+COLUMNS = ('played_at', 'player', 'mode', 'columns', 'rows', 'won', 'moves', 'mismatches', 'help_uses', 'seconds', 'round',
+           'score', 'opponent_score')
+INSERT = f"INSERT INTO games ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+TIME_ATTACK = 'Time Attack'  # ranked by the round reached rather than by time
+
+
+class StatsStore:
+    def __init__(self, path='memorygame_stats.db', batch_size=64, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size  # rows per transaction at most
+        self.flush_interval = flush_interval  # seconds a queued row waits at most
+        self.rows = queue.Queue()  # row tuples, flush events, requests and None to stop
+        self.written = 0
+        self.batches = 0
+        self._reader = None  # connection for queries, used by the thread that created it
+        self._writer = None  # the writer thread's connection, requests query through it
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stats-writer", daemon=True)
+            self._thread.start()
+
+    def record_game(self, player, mode, grid_size, won, moves, mismatches, help_uses, seconds, round=None, score=0,
+                    opponent_score=None):
+        # never blocks
+        self.start()
+        self.rows.put((time.time(), player, mode, grid_size[0], grid_size[1], int(won), moves, mismatches, help_uses, seconds,
+                       round, score, opponent_score))
+
+    def flush(self, timeout=None):
+        # waits until everything queued so far is on disk
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self.rows.put(done)
+        return done.wait(timeout)
+
+    def request(self, read, done):
+        # never blocks: read(store) runs on the writer thread once everything queued before it is
+        # written, then done(result) is called there
+        self.start()
+        self.rows.put(lambda: done(read(self)))
+
+    def close(self, timeout=5.0):
+        if self._thread is not None:
+            self.rows.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        # readers don't block the writer and a commit doesn't wait for a full fsync
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.commit()
+        return connection
+
+    def _run(self):
+        connection = self._writer = self._connect()
+        batch = []
+        waiting = []  # flush events answered after the next commit
+        requests = []  # run after the next commit
+        running = True
+        while running:
+            try:
+                item = self.rows.get(timeout=self.flush_interval if batch else None)
+            except queue.Empty:
+                item = False
+            if item is None:
+                running = False
+            elif isinstance(item, threading.Event):
+                waiting.append(item)
+            elif callable(item):
+                requests.append(item)
+            elif item is not False:
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                with connection:
+                    connection.executemany(INSERT, batch)
+                self.written += len(batch)
+                self.batches += 1
+                batch = []
+            for event in waiting:
+                event.set()
+            waiting = []
+            for request in requests:
+                request()
+            requests = []
+        self._writer = None
+        connection.close()
+
+    # queries, run on the calling thread against what has been written so far
+
+    def _query(self, sql, parameters):
+        if threading.current_thread() is self._thread:
+            return self._writer.execute(sql, parameters).fetchall()
+        if self._reader is None:
+            if not os.path.exists(self.path):
+                return []
+            self._reader = self._connect()
+        return self._reader.execute(sql, parameters).fetchall()
+
+    def leaderboard(self, mode, grid_size, limit=5):
+        # (player, seconds, moves, round), best first
+        if mode == TIME_ATTACK:
+            return self._query('SELECT player, seconds, moves, round FROM games WHERE mode = ? AND columns = ? AND rows = ? '
+                               'ORDER BY round DESC, seconds LIMIT ?', (mode, *grid_size, limit))
+        return self._query('SELECT player, seconds, moves, round FROM games WHERE mode = ? AND columns = ? AND rows = ? '
+                           'AND won = 1 ORDER BY seconds LIMIT ?', (mode, *grid_size, limit))
+
+    def personal_best(self, player, mode, grid_size):
+        # (seconds, moves, round) or None
+        if mode == TIME_ATTACK:
+            rows = self._query('SELECT seconds, moves, round FROM games WHERE player = ? AND mode = ? AND columns = ? AND rows = ? '
+                               'ORDER BY round DESC, seconds LIMIT 1', (player, mode, *grid_size))
+        else:
+            rows = self._query('SELECT seconds, moves, round FROM games WHERE player = ? AND mode = ? AND columns = ? AND rows = ? '
+                               'AND won = 1 ORDER BY seconds LIMIT 1', (player, mode, *grid_size))
+        return rows[0] if rows else None
+
+    def games_played(self, player):
+        return self._query('SELECT COUNT(*) FROM games WHERE player = ?', (player,))[0][0] if os.path.exists(self.path) else 0
+
+
+def benchmark(path='stats_benchmark.db', games=300000, seed=0):
+    # fills a fresh database through the writer thread, then times the screen's queries
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    store = StatsStore(path, batch_size=1000)
+    modes = ['1 Player', '2 Players', 'vs Computer', TIME_ATTACK]
+    start = time.perf_counter()
+    for _ in range(games):
+        mode = rng.choice(modes)
+        size = rng.choice([4, 6, 8])
+        store.record_game(f'player{rng.randrange(1000)}', mode, (size, size), rng.random() < 0.8, rng.randrange(8, 80),
+                          rng.randrange(0, 70), rng.randrange(2), rng.uniform(10, 400),
+                          rng.randrange(1, 12) if mode == TIME_ATTACK else None, rng.randrange(0, 18))
+    queued = time.perf_counter() - start
+    store.flush()
+    print(f'{games} games queued in {queued:.2f}s, written in {time.perf_counter() - start:.2f}s ({store.batches} batches)')
+    for name, query in [('leaderboard', lambda: store.leaderboard('1 Player', (6, 6))),
+                        ('time attack leaderboard', lambda: store.leaderboard(TIME_ATTACK, (4, 4))),
+                        ('personal best', lambda: store.personal_best('player7', '1 Player', (4, 4))),
+                        ('games played', lambda: store.games_played('player7'))]:
+        query()
+        start = time.perf_counter()
+        for _ in range(100):
+            query()
+        print(f'{name}: {(time.perf_counter() - start) * 10:.3f} ms')
+    store.close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,91 @@
+import os
+
+import pygame
+import pytest
+
+from asset_cache import AssetCache
+
+SIZE = (8, 6)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def display():
+    # entries are converted to the display's format, any display will do
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    yield
+    pygame.display.quit()
+
+
+def save_image(path, color):
+    image = pygame.Surface((16, 12))
+    image.fill(color)
+    pygame.image.save(image, str(path))
+    return str(path)
+
+
+def cached_image(cache, path):
+    made = []
+
+    def make():
+        made.append(path)
+        return pygame.transform.smoothscale(pygame.image.load(path).convert_alpha(), SIZE).convert()
+
+    surface = cache.image(cache.digest(path), SIZE, False, make)
+    return surface, bool(made)
+
+
+def change_image(path, color):
+    # a new size and mtime, as an edit would leave them
+    stat = os.stat(path)
+    image = pygame.Surface((20, 12))
+    image.fill(color)
+    pygame.image.save(image, path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_written_entry_is_hit_by_the_next_launch(tmp_path):
+    path = save_image(tmp_path / 'face.png', (200, 40, 10))
+    cache = AssetCache(str(tmp_path / 'cache'))
+    surface, made = cached_image(cache, path)
+    assert made and cache.stats()['misses'] == 1 and cache.bytes_written > 0
+    # a new cache reads the index and the entry from the directory
+    cache = AssetCache(str(tmp_path / 'cache'))
+    cached, made = cached_image(cache, path)
+    assert not made and cache.stats()['hits'] == 1
+    assert cached.get_size() == SIZE
+    assert cached.get_at((3, 3)) == surface.get_at((3, 3))
+
+
+def test_changed_source_replaces_its_entries(tmp_path):
+    path = save_image(tmp_path / 'face.png', (200, 40, 10))
+    cache = AssetCache(str(tmp_path / 'cache'))
+    cached_image(cache, path)
+    old_digest = cache.digest(path)
+    change_image(path, (10, 40, 200))
+    surface, made = cached_image(cache, path)
+    assert made and cache.digest(path) != old_digest
+    assert not cache.has_image(old_digest, SIZE, False)
+    assert len(cache.files()) == 1
+    color = surface.get_at((3, 3))
+    assert color.b > 150 > color.r  # the new color, smoothscale may round a channel down
+
+
+def test_entries_shared_by_two_sources_outlive_a_change_to_one(tmp_path):
+    first = save_image(tmp_path / 'first.png', (200, 40, 10))
+    second = save_image(tmp_path / 'second.png', (200, 40, 10))
+    cache = AssetCache(str(tmp_path / 'cache'))
+    cached_image(cache, first)
+    _, made = cached_image(cache, second)
+    assert not made  # the same bytes, so the same entry
+    digest = cache.digest(second)
+    change_image(first, (10, 40, 200))
+    cached_image(cache, first)
+    assert cache.has_image(digest, SIZE, False)
+    _, made = cached_image(cache, second)
+    assert not made
+    # once neither source has those bytes their entries go
+    change_image(second, (10, 200, 40))
+    cached_image(cache, second)
+    assert not cache.has_image(digest, SIZE, False)
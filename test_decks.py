@@ -0,0 +1,54 @@
+import pygame
+
+from decks import TextureCache
+from text_cache import surface_bytes
+
+FACE = 64 * 64 * 4  # bytes in a 64x64 face
+
+
+def face(width=64, height=64):
+    return pygame.Surface((width, height), pygame.SRCALPHA)
+
+
+def test_put_stays_within_the_budget():
+    cache = TextureCache(max_bytes=5 * FACE)
+    assert surface_bytes(face()) == FACE
+    for k in range(12):
+        cache.put(('deck', k, None), face())
+        assert cache.bytes <= cache.max_bytes
+    stats = cache.stats()
+    assert stats['entries'] == 5 and stats['bytes'] == 5 * FACE and stats['peak_bytes'] == 5 * FACE
+    assert stats['evictions'] == 7 and stats['evicted_bytes'] == 7 * FACE
+
+
+def test_least_recently_used_faces_go_first():
+    cache = TextureCache(max_bytes=3 * FACE)
+    for k in range(3):
+        cache.put(('deck', k, None), face())
+    assert cache.get(('deck', 0, None)) is not None  # 1 is now the oldest
+    cache.put(('deck', 3, None), face())
+    assert [key[1] for key in cache.entries] == [2, 0, 3]
+    # a larger face evicts as many as it needs
+    cache.put(('deck', 4, None), face(128, 64))
+    assert [key[1] for key in cache.entries] == [3, 4]
+    assert cache.bytes == 3 * FACE and cache.evicted_bytes == 3 * FACE
+
+
+def test_replacing_an_entry_does_not_count_it_twice():
+    cache = TextureCache(max_bytes=2 * FACE)
+    cache.put(('deck', 0, None), face())
+    cache.put(('deck', 0, None), face())
+    assert cache.bytes == FACE and cache.evictions == 0
+
+
+def test_a_face_over_the_budget_is_kept_alone():
+    cache = TextureCache(max_bytes=2 * FACE)
+    cache.put(('deck', 0, None), face())
+    cache.put(('deck', 1, None), face(256, 64))
+    assert list(cache.entries) == [('deck', 1, None)]
+    assert cache.bytes == 4 * FACE > cache.max_bytes
+    # and goes as soon as anything else is added
+    cache.put(('deck', 2, None), face())
+    assert list(cache.entries) == [('deck', 2, None)] and cache.bytes == FACE
+    cache.clear()
+    assert cache.bytes == 0 and cache.stats()['entries'] == 0
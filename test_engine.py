@@ -0,0 +1,155 @@
+import pytest
+
+from engine import MATCH, MISMATCH, SELECTED, MemoryEngine
+
+
+def new_engine(players=1):
+    return MemoryEngine(16, 8, players, seed=0)
+
+
+def pair_of(engine, card):
+    return engine.positions[card]
+
+
+def mismatched_tiles(engine):
+    first = pair_of(engine, 0)[0]
+    second = pair_of(engine, 1)[0]
+    return first, second
+
+
+def test_odd_board_is_rejected():
+    with pytest.raises(ValueError):
+        MemoryEngine(15)
+
+
+def test_deal_has_every_face_twice():
+    engine = new_engine()
+    assert sorted(engine.deck) == sorted(list(range(8)) * 2)
+    assert all(len(positions) == 2 for positions in engine.positions.values())
+
+
+def test_match_scores_and_clears_the_selection():
+    engine = new_engine()
+    first, second = pair_of(engine, 3)
+    assert engine.select(first) == SELECTED
+    assert engine.select(second) == MATCH
+    assert engine.is_matched(first) and engine.is_matched(second)
+    assert engine.scores == [1]
+    assert engine.moves == 1 and engine.mismatches == 0
+    assert engine.selected == [] and engine.selected_mask == 0
+    assert 3 not in engine.unmatched
+    assert not engine.can_select(first)
+
+
+def test_mismatch_waits_for_hide():
+    engine = new_engine()
+    first, second = mismatched_tiles(engine)
+    engine.select(first)
+    assert engine.select(second) == MISMATCH
+    assert engine.pending_hide and engine.mismatches == 1 and engine.moves == 1
+    assert engine.is_face_up(first) and engine.is_face_up(second)
+    # nothing can be picked while the pair is showing
+    assert engine.select(pair_of(engine, 2)[0]) is None
+    assert engine.hide_mismatch()
+    assert not engine.pending_hide and engine.selected == []
+    assert not engine.is_face_up(first) and not engine.is_face_up(second)
+
+
+def test_late_hide_keeps_a_new_first_pick():
+    engine = new_engine()
+    first, second = mismatched_tiles(engine)
+    engine.select(first)
+    engine.select(second)
+    engine.hide_mismatch()
+    pick = pair_of(engine, 2)[0]
+    engine.select(pick)
+    assert not engine.hide_mismatch()
+    assert engine.selected == [pick] and engine.is_selected(pick)
+
+
+def test_same_tile_cannot_be_picked_twice():
+    engine = new_engine()
+    tile = pair_of(engine, 0)[0]
+    engine.select(tile)
+    assert engine.select(tile) is None
+    assert engine.select(-1) is None and engine.select(16) is None
+
+
+def test_turn_passes_on_mismatch_only():
+    engine = new_engine(players=2)
+    first, second = pair_of(engine, 4)
+    engine.select(first)
+    engine.select(second)
+    assert engine.current_player == 0 and engine.scores == [1, 0]
+    first, second = mismatched_tiles(engine)
+    engine.select(first)
+    engine.select(second)
+    assert engine.current_player == 1
+    engine.hide_mismatch()
+    first, second = pair_of(engine, 5)
+    engine.select(first)
+    engine.select(second)
+    assert engine.scores == [1, 1]
+
+
+def test_help_pair_shows_an_unmatched_pair():
+    engine = new_engine()
+    first, second = pair_of(engine, 0)
+    engine.select(first)
+    engine.select(second)
+    pair = engine.help_pair()
+    assert pair is not None
+    assert engine.deck[pair[0]] == engine.deck[pair[1]] != 0
+    assert engine.help_mask == 1 << pair[0] | 1 << pair[1]
+    assert engine.help_uses == 1
+    engine.hide_help()
+    assert engine.help_mask == 0
+
+
+def test_help_pair_skips_selected_tiles():
+    engine = new_engine()
+    selected = pair_of(engine, 0)[0]
+    engine.select(selected)
+    for _ in range(8):
+        pair = engine.help_pair()
+        assert selected not in pair
+
+
+def test_help_pair_is_none_when_everything_is_matched():
+    engine = new_engine()
+    for card in range(8):
+        first, second = pair_of(engine, card)
+        engine.select(first)
+        engine.select(second)
+    assert engine.help_pair() is None
+
+
+def test_win_after_every_pair():
+    engine = new_engine()
+    for card in range(8):
+        assert not engine.is_won()
+        first, second = pair_of(engine, card)
+        engine.select(first)
+        engine.select(second)
+    assert engine.is_won()
+    assert engine.scores == [8] and engine.moves == 8
+    assert engine.remaining_pairs() == {}
+
+
+def test_shared_faces_on_a_large_board():
+    engine = MemoryEngine(36, 8, seed=1)
+    assert sum(engine.remaining_pairs().values()) == 18
+    positions = pair_of(engine, 0)
+    engine.select(positions[0])
+    assert engine.select(positions[1]) == MATCH
+    assert engine.remaining_pairs()[0] == len(positions) // 2 - 1
+
+
+def test_time_attack_limit_drops_to_the_minimum():
+    engine = new_engine()
+    engine.start_time_attack(20)
+    engine.next_round()
+    assert engine.time_limit == 15
+    engine.next_round(step=10)
+    assert engine.time_limit == 10
+    assert engine.moves == 0 and engine.matched == 0
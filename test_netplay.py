@@ -0,0 +1,54 @@
+import time
+
+from netplay import DEAL, DISCONNECTED, SELECT, LoopbackHost, NetClient, NetServer, play_loopback
+
+
+def test_loopback_game_ends_with_identical_boards():
+    client, host, _ = play_loopback((4, 4), seed=3)
+    assert host.is_won() and client.is_won()
+    assert client.deck == host.deck
+    assert client.matched == host.matched
+    assert client.scores == host.scores and sum(host.scores) == 8
+    assert (client.moves, client.mismatches) == (host.moves, host.mismatches)
+    assert client.current_player == host.current_player
+    assert client.selected == host.selected == []
+    assert not client.pending_hide and not host.pending_hide
+
+
+def wait_for(session, kind, timeout=5.0):
+    # the messages up to and including the first of kind
+    received = []
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        received += session.get_messages()
+        if any(k == kind for k, _ in received):
+            return received
+        time.sleep(0.01)
+    raise AssertionError(f'no message {kind} in {received}')
+
+
+def test_client_hears_when_the_host_goes():
+    host = LoopbackHost((4, 4), seed=3)
+    host.start('127.0.0.1', 0)
+    client = NetClient()
+    client.connect('127.0.0.1', host.port)
+    wait_for(client, DEAL)
+    host.close()
+    wait_for(client, DISCONNECTED)
+    assert not client.is_connected()
+    assert client.stats_text() == 'net: not connected'
+    client.close()
+
+
+def test_host_takes_a_new_client_after_a_disconnect():
+    host = NetServer()
+    host.start('127.0.0.1', 0)
+    for _ in range(2):
+        client = NetClient()
+        client.connect('127.0.0.1', host.port)
+        client.send(SELECT, 5)
+        assert wait_for(host, SELECT) == [(SELECT, (5,))]
+        client.close()
+        wait_for(host, DISCONNECTED)
+        assert not host.is_connected()
+    host.close()
@@ -0,0 +1,91 @@
+import random
+import types
+
+import replay
+from engine import MISMATCH, MemoryEngine
+from replay import GAME_START, LAYOUT, MOUSE, QUIT, HeadlessGame, Recorder, read_log, replay_headless
+
+SEED = 1234
+GRID = (4, 4)
+HIDE_DELAY = 500
+HELP_RECT = (700, 10, 80, 30)
+RESET_RECT = (10, 560, 100, 30)
+
+
+def tile_center(board_area, i):
+    bx, by, width, height = board_area
+    columns, rows = GRID
+    column, row = divmod(i, rows)
+    return bx + column * (width // columns) + 5, by + row * (height // rows) + 5
+
+
+def record_game(path, monkeypatch):
+    # plays a seeded game on an engine and logs it the way MemoryGame does
+    now = [0.0]
+    monkeypatch.setattr(replay, 'time', types.SimpleNamespace(perf_counter=lambda: now[0]))
+    board_area = (0, 0, 400, 400)
+    engine = MemoryEngine(16, 8, 1)
+    engine.rng.seed(SEED)
+    engine.new_game(1)
+    recorder = Recorder(path, 0, GRID)
+    recorder.game_start(SEED, GRID, 8, 1, False, False, 60, HIDE_DELAY, board_area, HELP_RECT, RESET_RECT)
+    rng = random.Random(0)
+    clicks = 0
+    while not engine.is_won():
+        now[0] += 0.2
+        if clicks == 3:
+            recorder.mouse((HELP_RECT[0] + 1, HELP_RECT[1] + 1), 1)
+            engine.help_pair()
+            now[0] += 1.0
+            engine.hide_help()
+        if clicks == 6:
+            # the window was resized, later clicks land on the new board area
+            board_area = (50, 20, 600, 500)
+            recorder.layout((800, 600), board_area, HELP_RECT, RESET_RECT)
+        i = rng.choice([i for i in range(engine.tiles) if engine.can_select(i)])
+        recorder.mouse(tile_center(board_area, i), 1)
+        clicks += 1
+        if engine.select(i) == MISMATCH:
+            now[0] += HIDE_DELAY / 1000 + 0.05
+            engine.hide_mismatch()
+    recorder.quit()
+    recorder.close()
+    return engine
+
+
+def test_log_round_trip(tmp_path, monkeypatch):
+    path = str(tmp_path / 'game.mgr')
+    record_game(path, monkeypatch)
+    (seed, grid_size), records = read_log(path)
+    assert (seed, grid_size) == (0, GRID)
+    kinds = [kind for kind, _, _ in records]
+    assert kinds[0] == GAME_START and kinds[-1] == QUIT
+    assert LAYOUT in kinds and MOUSE in kinds
+    assert records[0][2][0] == SEED
+    times = [ms for _, ms, _ in records]
+    assert times == sorted(times)
+
+
+def test_headless_replay_reaches_the_recorded_state(tmp_path, monkeypatch):
+    path = str(tmp_path / 'game.mgr')
+    engine = record_game(path, monkeypatch)
+    _, records = read_log(path)
+    _, ms, values = records[0]
+    assert HeadlessGame(ms, values).engine.deck == engine.deck  # the same deal from the logged seed
+    [summary] = replay_headless(path)
+    assert summary == {'won': True, 'timed_out': False, 'abandoned': False, 'moves': engine.moves,
+                       'mismatches': engine.mismatches, 'scores': engine.scores, 'help_uses': 1}
+
+
+def test_truncated_log_replays_up_to_where_it_stops(tmp_path, monkeypatch):
+    path = str(tmp_path / 'game.mgr')
+    record_game(path, monkeypatch)
+    with open(path, 'rb') as file:
+        data = file.read()
+    # the GAME_START record and its first two clicks, as if the game had crashed there
+    cut = replay.HEADER.size + replay.RECORD.size + replay.PAYLOADS[GAME_START].size
+    cut += 2 * (replay.RECORD.size + replay.PAYLOADS[MOUSE].size)
+    with open(path, 'wb') as file:
+        file.write(data[:cut])
+    [summary] = replay_headless(path)
+    assert summary['moves'] == 1 and not summary['won']
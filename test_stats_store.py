@@ -0,0 +1,75 @@
+import threading
+
+from stats_store import TIME_ATTACK, StatsStore
+
+
+def new_store(tmp_path, **options):
+    return StatsStore(str(tmp_path / 'stats.db'), **options)
+
+
+def record(store, player, seconds, won=True, mode='1 Player', grid_size=(4, 4), round=None):
+    store.record_game(player, mode, grid_size, won, 20, 4, 0, seconds, round)
+
+
+def test_counts_and_best_times(tmp_path):
+    store = new_store(tmp_path, batch_size=7)
+    for i in range(50):
+        record(store, f'player{i % 3}', 100 - i, won=i % 5 != 4)
+    assert store.flush(5)
+    assert store.written == 50 and store.batches >= 50 // 7
+    assert [store.games_played(f'player{i}') for i in range(3)] == [17, 17, 16]
+    assert store.games_played('nobody') == 0
+    assert store.personal_best('player0', '1 Player', (4, 4))[0] == 52
+    # the fastest game, i = 49, was player1's but it was lost
+    assert store.personal_best('player1', '1 Player', (4, 4))[0] == 54
+    leaderboard = store.leaderboard('1 Player', (4, 4), limit=3)
+    assert [(player, seconds) for player, seconds, _, _ in leaderboard] == [('player0', 52), ('player2', 53), ('player1', 54)]
+    store.close()
+
+
+def test_aggregates_are_kept_per_size_and_mode(tmp_path):
+    store = new_store(tmp_path)
+    record(store, 'ann', 30, grid_size=(4, 4))
+    record(store, 'ann', 20, grid_size=(6, 6))
+    record(store, 'ann', 10, mode='2 Players', grid_size=(4, 4))
+    record(store, 'ann', 90, mode=TIME_ATTACK, grid_size=(4, 4), won=False, round=3)
+    record(store, 'bob', 40, mode=TIME_ATTACK, grid_size=(4, 4), won=False, round=5)
+    record(store, 'bob', 60, mode=TIME_ATTACK, grid_size=(4, 4), won=False, round=5)
+    store.flush(5)
+    assert store.personal_best('ann', '1 Player', (4, 4))[0] == 30
+    assert store.personal_best('ann', '1 Player', (6, 6))[0] == 20
+    assert store.personal_best('ann', '1 Player', (8, 8)) is None
+    # time attack ranks by the round reached, then by time
+    assert [(player, round) for player, _, _, round in store.leaderboard(TIME_ATTACK, (4, 4))] == [
+        ('bob', 5), ('bob', 5), ('ann', 3)]
+    assert store.personal_best('bob', TIME_ATTACK, (4, 4))[0] == 40
+    store.close()
+
+
+def test_request_runs_after_the_rows_before_it(tmp_path):
+    store = new_store(tmp_path, flush_interval=60)
+    for i in range(3):
+        record(store, 'ann', 10 + i)
+    answered = threading.Event()
+    results = []
+
+    def done(result):
+        results.append((result, threading.current_thread().name))
+        answered.set()
+
+    store.request(lambda store: store.games_played('ann'), done)
+    assert answered.wait(5)
+    assert results == [(3, 'stats-writer')]
+    store.close()
+
+
+def test_close_writes_the_pending_batch(tmp_path):
+    # neither the batch size nor the flush interval is reached before close
+    store = new_store(tmp_path, batch_size=100, flush_interval=60)
+    for i in range(5):
+        record(store, 'ann', 10 + i)
+    store.close()
+    assert store.written == 5
+    reopened = new_store(tmp_path)
+    assert reopened.games_played('ann') == 5
+    reopened.close()
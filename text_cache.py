@@ -0,0 +1,125 @@
+from collections import OrderedDict
+import pygame
+
+
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+class SurfaceCache(LRUCache):
+    # surfaces bounded by their size in bytes rather than by their number
+    def __init__(self, max_bytes):
+        super().__init__(None)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.peak_bytes = 0
+        self.evicted_bytes = 0
+
+    def put(self, key, surface):
+        self._remove(key)
+        self.entries[key] = surface
+        self.bytes += surface_bytes(surface)
+        # the newest entry stays even when it alone is over budget
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= surface_bytes(evicted)
+            self.evicted_bytes += surface_bytes(evicted)
+            self.evictions += 1
+        self.peak_bytes = max(self.peak_bytes, self.bytes)
+
+    def _remove(self, key):
+        surface = self.entries.pop(key, None)
+        if surface is not None:
+            self.bytes -= surface_bytes(surface)
+        return surface
+
+    def clear(self):
+        super().clear()
+        self.bytes = 0
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({'bytes': self.bytes, 'max_bytes': self.max_bytes, 'peak_bytes': self.peak_bytes,
+                      'evicted_bytes': self.evicted_bytes})
+        return stats
+
+
+class TextCache:
+    def __init__(self, max_fonts=64, max_surfaces=1024):
+        self.fonts = LRUCache(max_fonts)  # (face, size) -> Font, face None is pygame's default font
+        self.surfaces = LRUCache(max_surfaces)  # (face, size, text, colour, antialias) -> Surface
+
+    def font(self, face, size):
+        key = (face, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(face, size)
+            self.fonts.put(key, font)
+        return font
+
+    def render(self, face, size, text, color, antialias=True):
+        key = (face, size, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.font(face, size).render(text, antialias, color)
+            self.surfaces.put(key, surface)
+        return surface
+
+    def glyphs_size(self, face, size, text):
+        # size of text drawn with draw_glyphs, one cached surface per character
+        font = self.font(face, size)
+        return sum(font.size(char)[0] for char in text), font.get_height()
+
+    def draw_glyphs(self, screen, position, face, size, text, color, antialias=True):
+        # for text that changes often but from a small alphabet, like timers: only single
+        # characters are rasterised and cached, strings are composed from them
+        x, y = position
+        for char in text:
+            glyph = self.render(face, size, char, color, antialias)
+            screen.blit(glyph, (x, y))
+            x += glyph.get_width()
+        return pygame.Rect(position, (x - position[0], self.font(face, size).get_height()))
+
+    def clear(self):
+        self.fonts.clear()
+        self.surfaces.clear()
+
+    def stats(self):
+        return {'fonts': self.fonts.stats(), 'surfaces': self.surfaces.stats()}
+
+
+# shared by every button, menu and the game
+text_cache = TextCache()
@@ -0,0 +1,145 @@
+from vosk import Model
+from voice_control import ArraySource, CommandDecoder, EnergyVad, WavSource, recognize
+import argparse
+import csv
+import math
+import os
+import random
+import time
+from array import array
+
+
+# Streams recorded utterances through the same recognition path the game uses and reports
+# latency, real-time factor and accuracy. Labels come from labels.csv (file,label) in the
+# directory, or from the file name: seven.wav, seven_2.wav, 7_noisy.wav, help.wav ...
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def load_labels(directory, phrases):
+    labels = {}
+    labels_path = os.path.join(directory, 'labels.csv')
+    if os.path.exists(labels_path):
+        with open(labels_path, newline='') as f:
+            for row in csv.reader(f):
+                if row:
+                    labels[row[0]] = row[1].strip()
+    else:
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith('.wav'):
+                labels[name] = os.path.splitext(name)[0].split('_')[0].replace('-', ' ')
+    expected = {}
+    for name, label in labels.items():
+        if label.isdigit():
+            expected[name] = int(label)
+        elif label in phrases:
+            expected[name] = phrases[label]
+        else:
+            raise ValueError(f'{name}: unknown label {label!r}')
+    return expected
+
+
+def build_stream(directory, expected, rate, pad_seconds, noise, rng):
+    # concatenate utterances with silence padding and mix in white noise
+    samples = array('h')
+    utterances = []
+    pad = array('h', bytes(int(pad_seconds * rate) * 2))
+    for name, label in expected.items():
+        source = WavSource(os.path.join(directory, name))
+        if source.rate != rate:
+            raise ValueError(f'{name}: expected {rate} Hz, got {source.rate} Hz')
+        samples.extend(pad)
+        start = len(samples)
+        samples.extend(array('h', source.data))
+        utterances.append((name, label, start, len(samples)))
+    samples.extend(pad)
+    if noise:
+        for i in range(len(samples)):
+            samples[i] = max(-32768, min(32767, samples[i] + int(rng.gauss(0, noise))))
+    return samples.tobytes(), utterances
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    model = Model(args.model)
+    decoder = CommandDecoder(model, args.max_number, args.rate, not args.no_grammar)
+    vad = None if args.no_vad else EnergyVad(args.energy_threshold, args.zcr_threshold)
+    expected = load_labels(args.directory, decoder.phrases)
+    data, utterances = build_stream(args.directory, expected, args.rate, args.pad, args.noise, rng)
+    source = ArraySource(data, args.rate, args.chunk, realtime=args.realtime)
+
+    emitted = []  # (frame position, command, seconds spent decoding the chunk)
+    busy = 0.0
+    source.open()
+    start = time.perf_counter()
+    while True:
+        chunk = source.read()
+        if source.finished:
+            break
+        before = time.perf_counter()
+        commands = recognize(decoder, vad, chunk)
+        spent = time.perf_counter() - before
+        busy += spent
+        for command in commands:
+            emitted.append((source.position, command, spent))
+    wall = time.perf_counter() - start
+    command = decoder.flush()
+    if command is not None:
+        emitted.append((source.position, command, 0.0))
+
+    # each command belongs to the utterance whose window (start to next start) it falls in
+    correct = 0
+    latencies = []
+    false_triggers = 0
+    bounds = [u[2] for u in utterances[1:]] + [len(data) // 2 + 1]
+    for (name, label, begin, end), next_begin in zip(utterances, bounds):
+        window = [e for e in emitted if begin <= e[0] < next_begin]
+        if window:
+            position, command, spent = window[0]
+            false_triggers += len(window) - 1
+            if command == label:
+                correct += 1
+                # time from the end of the utterance until the command is out, negative when a partial won
+                latencies.append((position - end) / args.rate + spent)
+        elif args.verbose:
+            print(f'{name}: no command')
+        if args.verbose and window:
+            print(f'{name}: expected {label}, got {window[0][1]}')
+
+    audio_seconds = len(data) / 2 / args.rate
+    print(f'utterances: {len(utterances)}  audio: {audio_seconds:.1f}s  wall: {wall:.2f}s')
+    print(f'accuracy: {correct / max(1, len(utterances)):.1%}  false triggers: {false_triggers}')
+    print(f'real-time factor: {busy / audio_seconds:.3f}')
+    for p in (50, 90, 99):
+        print(f'latency p{p}: {percentile(latencies, p) * 1000:.0f} ms')
+    if vad is not None:
+        stats = vad.stats()
+        print(f"vad: {stats['frames_skipped']} frames skipped, {stats['frames_decoded']} decoded")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark voice control on recorded utterances')
+    parser.add_argument('directory', help='directory of 16 bit mono WAV files')
+    parser.add_argument('--model', default='vosk-model-small-en-us-0.15')
+    parser.add_argument('--max-number', type=int, default=16, help='largest tile number in the grammar')
+    parser.add_argument('--rate', type=int, default=16000)
+    parser.add_argument('--chunk', type=int, default=2000)
+    parser.add_argument('--pad', type=float, default=1.0, help='seconds of silence around each utterance')
+    parser.add_argument('--noise', type=float, default=0.0, help='standard deviation of added white noise')
+    parser.add_argument('--realtime', action='store_true', help='feed audio at microphone speed')
+    parser.add_argument('--no-grammar', action='store_true')
+    parser.add_argument('--no-vad', action='store_true')
+    parser.add_argument('--energy-threshold', type=float, default=500)
+    parser.add_argument('--zcr-threshold', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-v', '--verbose', action='store_true')
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+from array import array
+from collections import deque
+import json
+import math
+import os
+import queue
+import threading
+import time
+import wave
+
+# vosk and pyaudio are imported where they are used so the game starts without paying for them
+
+
+ONES = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten',
+        'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen', 'eighteen', 'nineteen']
+TENS = ['', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety']
+
+# spoken words that are not tile numbers
+VOICE_COMMANDS = ['help', 'reset', 'mute']
+
+
+def spell_number(number):
+    # 42 -> 'forty two', the way the small English model writes it
+    if number < 20:
+        return ONES[number]
+    if number < 100:
+        tens, ones = divmod(number, 10)
+        return TENS[tens] + (' ' + ONES[ones] if ones else '')
+    hundreds, rest = divmod(number, 100)
+    return ONES[hundreds] + ' hundred' + (' ' + spell_number(rest) if rest else '')
+
+
+def number_words(max_number):
+    return {spell_number(n): n for n in range(1, max_number + 1)}
+
+
+class ModelLoader:
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.model = None
+        self.error = None
+        self.load_seconds = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # loads the Vosk model on a background thread, safe to call more than once
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._load, name="voice-model-loader", daemon=True)
+            self._thread.start()
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            if not os.path.exists(self.model_path):
+                raise FileNotFoundError(self.model_path)
+            from vosk import Model
+            self.model = Model(self.model_path)
+        except Exception as error:  # a missing model or vosk install only disables voice control
+            self.error = error
+        self.load_seconds = time.perf_counter() - start
+        self._done.set()
+
+    def is_done(self):
+        return self._done.is_set()
+
+    def is_ready(self):
+        return self._done.is_set() and self.model is not None
+
+    def wait(self, timeout=None):
+        self.start()
+        self._done.wait(timeout)
+        return self.model
+
+
+class CommandDecoder:
+    def __init__(self, model, max_number, rate=16000, use_grammar=True):
+        self.model = model
+        self.rate = rate
+        self.use_grammar = use_grammar
+        self.set_max_number(max_number)
+
+    def set_max_number(self, max_number):
+        self.max_number = max_number
+        self.phrases = number_words(max_number)
+        for command in VOICE_COMMANDS:
+            self.phrases[command] = command
+        # a phrase is ambiguous while it is the start of a longer one ("six" / "sixteen", "twenty" / "twenty one"),
+        # however long it stays the partial result a slow speaker may still be saying the longer one
+        self.ambiguous = {phrase for phrase in self.phrases
+                          if any(other != phrase and other.startswith(phrase) for other in self.phrases)}
+        self.reset()
+
+    def reset(self):
+        from vosk import KaldiRecognizer
+        if self.use_grammar:
+            # restrict decoding to the tile numbers of the current board and the commands
+            grammar = list(self.phrases) + ['[unk]']
+            self.rec = KaldiRecognizer(self.model, self.rate, json.dumps(grammar))
+        else:
+            self.rec = KaldiRecognizer(self.model, self.rate)
+
+    def _lookup(self, text):
+        return self.phrases.get(text.replace('[unk]', '').strip(), None)
+
+    def accept(self, data):
+        # feed one chunk of 16 bit mono audio, returns a command or None
+        if self.rec.AcceptWaveform(data):
+            return self._finish(json.loads(self.rec.Result()))
+        if not self.use_grammar:
+            return None
+        # [unk] is dropped once, so "six [unk]" waits to be told apart from "sixteen" like "six" does
+        text = json.loads(self.rec.PartialResult()).get('partial', '').replace('[unk]', '').strip()
+        # an ambiguous phrase is only taken at the end of the utterance, from Result() or flush()
+        if text in self.ambiguous:
+            return None
+        command = self._lookup(text)
+        if command is None:
+            return None
+        # act now instead of waiting for the end of the utterance
+        self.rec.Reset()
+        return command
+
+    def flush(self):
+        # called when the audio stops, e.g. on silence, to get the last utterance out
+        return self._finish(json.loads(self.rec.FinalResult()))
+
+    def _finish(self, result):
+        return self._lookup(result.get('text', '').lower())
+
+
+class EnergyVad:
+    def __init__(self, energy_threshold=500, zcr_threshold=0.25, preroll=2, hangover=3):
+        self.energy_threshold = energy_threshold  # RMS of 16 bit samples
+        # quiet but noisy chunks (fricatives like the "s" of "six") still count as speech
+        self.zcr_threshold = zcr_threshold
+        self.hangover = hangover  # chunks still decoded after the level drops, so word endings get through
+        self.preroll = deque(maxlen=preroll)  # silent chunks kept so word onsets aren't clipped
+        self.in_speech = False
+        self._quiet_chunks = 0
+        self.frames_skipped = 0
+        self.frames_decoded = 0
+
+    def measure(self, data):
+        samples = array('h', data)
+        if not samples:
+            return 0.0, 0.0
+        rms = math.sqrt(sum(s * s for s in samples) / len(samples))
+        crossings = sum(1 for a, b in zip(samples, samples[1:]) if (a < 0) != (b < 0))
+        return rms, crossings / len(samples)
+
+    def is_speech(self, data):
+        rms, zcr = self.measure(data)
+        return rms >= self.energy_threshold or (rms >= self.energy_threshold / 2 and zcr >= self.zcr_threshold)
+
+    def process(self, data):
+        # returns the chunks to decode (pre-roll included) and whether speech just ended
+        frames = len(data) // 2
+        if self.is_speech(data):
+            chunks = list(self.preroll) if not self.in_speech else []
+            chunks.append(data)
+            self.preroll.clear()
+            self.in_speech = True
+            self._quiet_chunks = 0
+            self.frames_decoded += sum(len(c) for c in chunks) // 2
+            return chunks, False
+        if self.in_speech:
+            self._quiet_chunks += 1
+            if self._quiet_chunks <= self.hangover:
+                self.frames_decoded += frames
+                return [data], False
+            self.in_speech = False
+            self.preroll.append(data)
+            return [], True
+        if len(self.preroll) == self.preroll.maxlen:
+            # the oldest pre-roll chunk falls out without ever being decoded
+            self.frames_skipped += len(self.preroll[0]) // 2
+        self.preroll.append(data)
+        return [], False
+
+    def stats(self):
+        return {'frames_skipped': self.frames_skipped, 'frames_decoded': self.frames_decoded}
+
+
+class MicrophoneSource:
+    def __init__(self, rate=16000, chunk=2000):
+        self.rate = rate
+        self.chunk = chunk
+        self.finished = False  # a microphone never runs out
+        self._audio = None
+        self._stream = None
+
+    def open(self):
+        import pyaudio
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=self.rate, input=True, frames_per_buffer=self.chunk * 2)
+        self._stream.start_stream()
+
+    def read(self):
+        return self._stream.read(self.chunk, exception_on_overflow=False)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._audio.terminate()
+            self._stream = None
+
+
+class ArraySource:
+    def __init__(self, data, rate=16000, chunk=2000, realtime=False):
+        self.data = data  # 16 bit mono PCM bytes
+        self.rate = rate
+        self.chunk = chunk
+        self.realtime = realtime  # pace reads like a microphone instead of as fast as possible
+        self.position = 0  # in frames
+        self.finished = False
+        self._started = None
+
+    def open(self):
+        self.position = 0
+        self.finished = False
+        self._started = time.perf_counter()
+
+    def read(self):
+        start = self.position * 2
+        data = self.data[start:start + self.chunk * 2]
+        self.position += len(data) // 2
+        if not data:
+            self.finished = True
+        elif self.realtime:
+            delay = self._started + self.position / self.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def close(self):
+        pass
+
+
+class WavSource(ArraySource):
+    def __init__(self, path, chunk=2000, realtime=False):
+        with wave.open(path, 'rb') as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise ValueError(f'{path}: expected 16 bit mono audio')
+            rate = wav.getframerate()
+            data = wav.readframes(wav.getnframes())
+        super().__init__(data, rate, chunk, realtime)
+
+
+def recognize(decoder, vad, data):
+    # the shared recognition path: optional VAD gate, then the decoder, returns decoded commands
+    if vad is None:
+        chunks, speech_ended = [data], False
+    else:
+        chunks, speech_ended = vad.process(data)
+    commands = []
+    for chunk in chunks:
+        command = decoder.accept(chunk)
+        if command is not None:
+            commands.append(command)
+    if speech_ended:
+        # the recognizer never sees the silence that would end the utterance, so end it here
+        command = decoder.flush()
+        if command is not None:
+            commands.append(command)
+    return commands
+
+
+class VoiceWorker:
+    def __init__(self, model, max_number, rate=16000, chunk=2000, use_grammar=True, vad=None, source=None, notify=None):
+        self.model = model
+        self.notify = notify  # called from the worker thread after a command is queued
+        self.vad = vad  # optional EnergyVad, silent chunks never reach the recognizer
+        self.max_number = max_number
+        self.rate = rate
+        self.chunk = chunk  # frames read from the microphone per iteration, 2000 is 125 ms
+        # anything with open/read/close, the microphone unless a recording is given
+        self.source = source if source is not None else MicrophoneSource(rate, chunk)
+        self.use_grammar = use_grammar
+        self.commands = queue.Queue()  # tile numbers and command words, filled by the worker thread
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, timeout=1.0):
+        # a stopped worker may still be in its last read, the source is only opened again once it has
+        # closed it; False if it hasn't within timeout
+        if self._thread is not None and self._stop_event.is_set():
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return False
+            self._thread = None
+            self.get_commands()
+        if self.is_running():
+            return True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="voice-worker", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                self._thread = None  # otherwise the next start() waits for it
+        # drop anything the worker decoded after the game stopped listening
+        self.get_commands()
+
+    def get_commands(self):
+        # non-blocking drain, safe to call every frame
+        commands = []
+        while True:
+            try:
+                commands.append(self.commands.get_nowait())
+            except queue.Empty:
+                return commands
+
+    def _run(self):
+        decoder = CommandDecoder(self.model, self.max_number, self.source.rate, self.use_grammar)
+        self.source.open()
+        try:
+            while not self._stop_event.is_set():
+                if self.source.finished:
+                    # a recording ran out, possibly mid utterance, get its last words out
+                    self._put([decoder.flush()])
+                    break
+                data = self.source.read()
+                if len(data) == 0:
+                    continue
+                self._put(recognize(decoder, self.vad, data))
+        finally:
+            self.source.close()
+
+    def _put(self, commands):
+        for command in commands:
+            if command is not None:
+                self.commands.put(command)
+                if self.notify is not None:
+                    self.notify()